@@ -50,11 +50,21 @@ export default function Home() {
         setLogs(data.logs || []);
         setCurrentStep(data.current_step || 0);
         setStatus(data.status);
-        setPatch(data.patch || "");
 
         // If completed or failed, show results
         if (data.status === "completed" || data.status === "failed") {
           clearInterval(pollInterval);
+
+          // the patch lives on its own endpoint so status polls stay small
+          if (data.status === "completed") {
+            try {
+              const patchResponse = await fetch(`http://localhost:8000/api/runs/${runId}/patch`);
+              setPatch(patchResponse.ok && patchResponse.status !== 204 ? await patchResponse.text() : "");
+            } catch {
+              setPatch("");
+            }
+          }
+
           setTimeout(() => {
             setView("result");
           }, 1000);
@@ -1,13 +1,38 @@
 import os
+import asyncio
 import json
+import time
+import selectors
 import subprocess
 import logging
 from pathlib import Path
 from typing import Optional, Dict, List
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+def _read_json(path: Path):
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _write_json(path: Path, obj):
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(obj, f, indent=2)
+
+
 class InstanceCacheManager:
 
     def __init__(self, cache_dir: str = "/app/cache/swebench"):
@@ -18,6 +43,10 @@ class InstanceCacheManager:
         self.trigger_file = self.cache_dir / "setup_trigger.json"
         if not self.trigger_file.exists():
             self._create_trigger_file()
+
+        # lazily-populated snapshot of `docker images` so repeated cache
+        # checks don't each pay a ~100ms subprocess fork
+        self._docker_images: Optional[set] = None
     
     def _create_trigger_file(self):
         trigger = [{
@@ -25,8 +54,7 @@ class InstanceCacheManager:
             "model_patch": "",
             "model_name_or_path": "setup"
         }]
-        with open(self.trigger_file, 'w') as f:
-            json.dump(trigger, f, indent=2)
+        _write_json(self.trigger_file, trigger)
         logger.info(f"Created trigger file at {self.trigger_file}")
     
     def is_instance_cached(self, instance_id: str) -> bool:
@@ -44,9 +72,7 @@ class InstanceCacheManager:
         logger.info(f"Instance {instance_id} not in cache")
         return False
     
-    # check if exit in cache
-    # download if not
-    def _docker_image_exists(self, instance_id: str) -> bool:
+    def _load_docker_images(self) -> set:
         try:
             result = subprocess.run(
                 ["docker", "images", "--format", "{{.Repository}}:{{.Tag}}"],
@@ -54,39 +80,91 @@ class InstanceCacheManager:
                 text=True,
                 timeout=10
             )
-            
-            for line in result.stdout.strip().split('\n'):
-                if instance_id in line and 'sweb.eval' in line:
-                    logger.info(f"Found Docker image: {line}")
-                    return True
-            
-            return False
+            return {line.strip() for line in result.stdout.splitlines() if line.strip()}
         except Exception as e:
-            logger.warning(f"Failed to check Docker image: {e}")
-            return False
+            logger.warning(f"Failed to list Docker images: {e}")
+            return set()
+
+    def refresh_docker_cache(self):
+        """Invalidate the image snapshot (e.g. after a new image was built)"""
+        self._docker_images = None
+
+    # check if exit in cache
+    # download if not
+    def _docker_image_exists(self, instance_id: str) -> bool:
+        if self._docker_images is None:
+            self._docker_images = self._load_docker_images()
+
+        for tag in self._docker_images:
+            if instance_id in tag and 'sweb.eval' in tag:
+                logger.info(f"Found Docker image: {tag}")
+                return True
+
+        return False
     
-    def download_instance(self, instance_id: str) -> bool:
+    def _stream_subprocess_output(self, process, timeout: Optional[int] = None):
+        # drain the pipe with a selector instead of blocking on readline,
+        # so a full pipe buffer can never stall us and a deadline can be
+        # enforced while the build is still streaming
+        deadline = time.monotonic() + timeout if timeout else None
+        sel = selectors.DefaultSelector()
+        sel.register(process.stdout, selectors.EVENT_READ)
+        os.set_blocking(process.stdout.fileno(), False)
+        partial = b""
+
+        try:
+            while True:
+                if deadline and time.monotonic() > deadline:
+                    logger.error("SWE-bench subprocess timed out, terminating")
+                    process.kill()
+                    break
+
+                events = sel.select(timeout=1.0)
+                if not events:
+                    if process.poll() is not None:
+                        break
+                    continue
+
+                chunk = process.stdout.read()
+                if not chunk:
+                    break
+
+                partial += chunk
+                *lines, partial = partial.split(b'\n')
+                for line in lines:
+                    logger.info(f"[SWE-bench] {line.decode('utf-8', errors='replace').rstrip()}")
+        finally:
+            sel.unregister(process.stdout)
+            sel.close()
+
+        if partial:
+            logger.info(f"[SWE-bench] {partial.decode('utf-8', errors='replace').rstrip()}")
+
+        process.wait()
+
+    def download_instance(self, instance_id: str, timeout: Optional[int] = None) -> bool:
         logger.info(f"Downloading instance {instance_id} from SWE-bench...")
         
         try:
-            with open(self.trigger_file, 'r') as f:
-                trigger = json.load(f)
-            
+            trigger = _read_json(self.trigger_file)
+
             if not isinstance(trigger, list):
                 trigger = [trigger]
-            
+
             trigger[0]["instance_id"] = instance_id
-            
-            with open(self.trigger_file, 'w') as f:
-                json.dump(trigger, f, indent=2)
-            
+
+            # per-instance trigger file so concurrent downloads can't
+            # clobber each other's predictions path
+            instance_trigger = self.instances_dir / f"{instance_id}.trigger.json"
+            _write_json(instance_trigger, trigger)
+
             command = [
                 "python", "-m", "swebench.harness.run_evaluation",
                 "--dataset_name", "princeton-nlp/SWE-bench_Lite",
                 "--instance_ids", instance_id,
                 "--run_id", "build_check",
                 "--max_workers", "1",
-                "--predictions_path", str(self.trigger_file)
+                "--predictions_path", str(instance_trigger)
             ]
             
             logger.info(f"Running: {' '.join(command)}")
@@ -94,20 +172,15 @@ class InstanceCacheManager:
             process = subprocess.Popen(
                 command,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
+                stderr=subprocess.STDOUT
             )
-            
-            for line in process.stdout:
-                logger.info(f"[SWE-bench] {line.rstrip()}")
-            
-            process.wait()
-            
+
+            self._stream_subprocess_output(process, timeout=timeout)
+
             if process.returncode == 0:
                 marker = self.instances_dir / f"{instance_id}.cached"
                 marker.touch()
+                self.refresh_docker_cache()
                 logger.info(f"Successfully cached instance {instance_id}")
                 return True
             else:
@@ -119,7 +192,25 @@ class InstanceCacheManager:
             import traceback
             traceback.print_exc()
             return False
-    
+
+    async def adownload_instance(self, instance_id: str, timeout: Optional[int] = None) -> bool:
+        # the download is subprocess-bound, so a worker thread is enough
+        # to let several builds overlap
+        return await asyncio.to_thread(self.download_instance, instance_id, timeout)
+
+    async def download_instances(self, instance_ids: List[str], concurrency: int = 4) -> Dict[str, bool]:
+        """Download several instances in parallel under a bounded semaphore"""
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _guarded(instance_id):
+            async with sem:
+                if self.is_instance_cached(instance_id):
+                    return True
+                return await self.adownload_instance(instance_id)
+
+        results = await asyncio.gather(*(_guarded(i) for i in instance_ids))
+        return dict(zip(instance_ids, results))
+
     def get_cache_info(self) -> Dict[str, any]:
         cached_instances = []
         
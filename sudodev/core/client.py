@@ -1,31 +1,167 @@
 import os
-from groq import Groq
+import time
+import asyncio
+import random
+import threading
+import httpx
+from groq import (
+    Groq,
+    AsyncGroq,
+    RateLimitError,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+)
 from sudodev.core.utils.logger import setup_logger
+from sudodev.core.utils.llm_cache import LLMCache, cache_enabled, make_key
 
 logger = setup_logger(__name__)
 
 class LLMClient:
-    def __init__(self):
+    def __init__(self, enable_cache: bool = None, cache_path: str = None, cache_ttl: int = 24 * 3600):
         api_key = os.environ.get("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY environment variable not set")
-        self.client = Groq(api_key=api_key)
+        # explicit pools so concurrent callers reuse warm connections
+        # instead of paying a TCP+TLS handshake per request
+        limits = httpx.Limits(max_keepalive_connections=64, max_connections=128)
+        timeout = httpx.Timeout(60.0, connect=5.0)
+        self._http = httpx.Client(limits=limits, timeout=timeout)
+        self._ahttp = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self.client = Groq(api_key=api_key, http_client=self._http)
+        self.aclient = AsyncGroq(api_key=api_key, http_client=self._ahttp)
         self.model = "llama-3.3-70b-versatile"
 
-    def get_completion(self, system_prompt: str, user_prompt: str, temperature: float = 0.2, max_tokens: int = 4096, conversation_history: list = None) -> str:
+        # SUDODEV_LLM_CACHE=0 turns the cache off when not set explicitly
+        if enable_cache is None:
+            enable_cache = cache_enabled()
+        self.enable_cache = enable_cache
+        self._cache = LLMCache(cache_path, ttl=cache_ttl) if enable_cache else None
+
+        # one event loop for the client's lifetime: connections the async
+        # pool opens under asyncio.run()'s throwaway loop die with it and
+        # poison later runs ("Event loop is closed"), so every sync entry
+        # point funnels through this loop instead
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="llm-async-loop",
+                    daemon=True
+                ).start()
+        return self._loop
+
+    def run_async(self, coro):
+        """Run a coroutine on the client's persistent event loop and
+        block for the result; safe to call repeatedly from sync code"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result()
+
+    def close(self):
+        """Release pooled sockets and the cache connection"""
+        if self._loop is not None:
+            try:
+                self.run_async(self._ahttp.aclose())
+            except Exception as e:
+                logger.warning(f"failed to close async HTTP client: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        try:
+            self._http.close()
+        except Exception as e:
+            logger.warning(f"failed to close HTTP client: {e}")
+        if self._cache:
+            try:
+                self._cache.close()
+            except Exception as e:
+                logger.warning(f"failed to close response cache: {e}")
+
+    def _cache_key(self, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int) -> bytes:
+        return make_key(self.model, temperature, max_tokens, system_prompt, user_prompt)
+
+    def _cache_get(self, key: bytes) -> str:
+        return self._cache.get(key) if self._cache else None
+
+    def _cache_put(self, key: bytes, response: str):
+        if self._cache:
+            self._cache.put(key, response)
+
+    def get_completion(self, system_prompt: str, user_prompt: str, temperature: float = 0.2, max_tokens: int = 4096, conversation_history: list = None, stream: bool = False, stop_when = None) -> str:
         try:
+            # conversation_history makes the exchange stateful, so only
+            # pure (system, user) prompts are cacheable
+            if not conversation_history:
+                key = self._cache_key(system_prompt, user_prompt, temperature, max_tokens)
+                cached = self._cache_get(key)
+                if cached is not None:
+                    logger.info(f"cache hit ({len(cached)} chars), skipping API call")
+                    return cached
+
             messages = [{"role": "system", "content": system_prompt}]
             if conversation_history:
                 messages.extend(conversation_history)
             messages.append({"role": "user", "content": user_prompt})
 
-            logger.info(f"sending request to {self.model} (temp = {temperature}, max_tokens = {max_tokens})")
+            logger.info(f"sending request to {self.model} (temp = {temperature}, max_tokens = {max_tokens}, stream = {stream})")
             logger.debug(f"user prompt preview: {user_prompt[:100]} ...")
 
             response = self.client.chat.completions.create(
                 model = self.model,
                 messages = messages,
-                temperature = temperature, 
+                temperature = temperature,
+                max_tokens = max_tokens,
+                top_p = 1,
+                stream = stream
+            )
+
+            truncated = False
+            if stream:
+                # accumulate chunks as they arrive; stop_when lets callers
+                # that only need a structured header cut generation short
+                result = ""
+                for chunk in response:
+                    delta = chunk.choices[0].delta.content or ""
+                    result += delta
+                    if stop_when and delta and stop_when(result):
+                        logger.info(f"early stream termination after {len(result)} chars")
+                        response.close()
+                        truncated = True
+                        break
+            else:
+                result = response.choices[0].message.content
+
+            logger.info(f"received response ({len(result)} chars)")
+            logger.debug(f"response preview: {result[:100]}...")
+
+            # a stream cut short by stop_when is not the full completion;
+            # caching it would serve the truncated text to later callers
+            # that hit the same key without a stop_when
+            if not conversation_history and not truncated:
+                self._cache_put(key, result)
+
+            return result
+        except Exception as e:
+            logger.error(f"LLM API call failed: {e}")
+            raise
+
+    async def aget_completion(self, system_prompt: str, user_prompt: str, temperature: float = 0.2, max_tokens: int = 4096, conversation_history: list = None) -> str:
+        try:
+            messages = [{"role": "system", "content": system_prompt}]
+            if conversation_history:
+                messages.extend(conversation_history)
+            messages.append({"role": "user", "content": user_prompt})
+
+            logger.info(f"sending async request to {self.model} (temp = {temperature}, max_tokens = {max_tokens})")
+            logger.debug(f"user prompt preview: {user_prompt[:100]} ...")
+
+            response = await self.aclient.chat.completions.create(
+                model = self.model,
+                messages = messages,
+                temperature = temperature,
                 max_tokens = max_tokens,
                 top_p = 1,
                 stream = False
@@ -37,9 +173,28 @@ class LLMClient:
 
             return result
         except Exception as e:
-            logger.error(f"LLM API call failed: {e}")
+            logger.error(f"async LLM API call failed: {e}")
             raise
-    
+
+    async def get_completions_batch(self, requests: list, concurrency: int = 16) -> list:
+        # each request is a dict of kwargs for aget_completion; independent
+        # calls overlap on network I/O instead of serializing
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _one(kwargs):
+            async with sem:
+                return await self.aget_completion(**kwargs)
+
+        logger.info(f"dispatching batch of {len(requests)} completions (concurrency = {concurrency})")
+        return await asyncio.gather(*(_one(r) for r in requests), return_exceptions=True)
+
+    def get_completions_batch_sync(self, requests: list, concurrency: int = 16) -> list:
+        return self.run_async(self.get_completions_batch(requests, concurrency=concurrency))
+
+    # only these are worth retrying; auth/validation errors fail identically
+    # on every attempt and should surface immediately
+    RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
     def get_completion_with_retry(
             self,
             system_prompt: str,
@@ -48,7 +203,6 @@ class LLMClient:
             max_tokens: int = 4096,
             max_retries: int = 3
     ) -> str:
-        import time
         for attempt in range(max_retries):
             try:
                 return self.get_completion(
@@ -57,15 +211,29 @@ class LLMClient:
                     temperature=temperature,
                     max_tokens=max_tokens
                 )
-            except Exception as e:
+            except self.RETRYABLE_ERRORS as e:
                 if attempt < max_retries-1:
-                    wait_time = 2 ** attempt
-                    logger.warning(f"Attemp t {attempt + 1} failed: {e}. Retrying in {wait_time} seconds...")
+                    wait_time = self._retry_wait(e, attempt)
+                    logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {wait_time:.1f} seconds...")
                     time.sleep(wait_time)
                 else:
-                    logger.error("all {max_retries} attempts failed.")
+                    logger.error(f"all {max_retries} attempts failed.")
                     raise
 
+    @staticmethod
+    def _retry_wait(error, attempt: int) -> float:
+        # honor Retry-After when the server tells us exactly when to come
+        # back; otherwise use full jitter so parallel workers don't retry
+        # in lockstep and re-trigger the same rate limit
+        if isinstance(error, RateLimitError):
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(2 ** attempt, 30))
+
 
     def get_structured_completion(self, system_prompt: str, user_prompt: str, temperature: float = 0.2) -> str:
         enhanced_system = system_prompt + "\n Respond in a clear, structured format."
@@ -1,16 +1,77 @@
 import ast
+import os
 import re
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Tuple, Optional
 from sudodev.core.utils.logger import setup_logger
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 logger = setup_logger(__name__)
 
+_WORD_RE = re.compile(r'\w+')
+
+def _parse_python_structure(file_content: str) -> Dict[str, any]:
+    tree = ast.parse(file_content)
+
+    structure = {
+        'classes': [],
+        'functions': [],
+        'imports': []
+    }
+
+    # only top-level statements matter here, so walk tree.body
+    # directly instead of visiting every node in the file
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            methods = [
+                m.name for m in node.body
+                if isinstance(m, (ast.FunctionDef, ast.AsyncFunctionDef))
+            ]
+            structure['classes'].append({
+                'name': node.name,
+                'lineno': node.lineno,
+                'end_lineno': node.end_lineno,
+                'methods': methods,
+                'docstring': ast.get_docstring(node)
+            })
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            structure['functions'].append({
+                'name': node.name,
+                'lineno': node.lineno,
+                'end_lineno': node.end_lineno,
+                'docstring': ast.get_docstring(node)
+            })
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            structure['imports'].append(node.lineno)
+
+    return structure
+
+def _parse_python_structure_safe(file_content: str) -> Optional[Dict[str, any]]:
+    # worker-process entry point: swallow syntax errors the same way
+    # parse_python_file does, since exceptions don't cross cleanly
+    try:
+        return _parse_python_structure(file_content)
+    except SyntaxError:
+        return None
+
 class ContextSearch:
     def __init__(self, llm_client):
         self.llm = llm_client
-    
-    def extract_keywords_from_issue(self, issue_text: str) -> Dict[str, List[str]]:
-        prompt = f"""Analyze this GitHub issue and extract relevant search keywords.
+
+    @staticmethod
+    def _keywords_complete(text: str) -> bool:
+        # the CONCEPTS line is the last labeled line we need; once it is
+        # terminated by a newline the rest of the generation is wasted tokens
+        idx = text.find('CONCEPTS:')
+        return idx != -1 and '\n' in text[idx:]
+
+    def _build_keywords_prompt(self, issue_text: str) -> str:
+        return f"""Analyze this GitHub issue and extract relevant search keywords.
 
 Issue:
 {issue_text[:2000]}
@@ -29,13 +90,34 @@ VARIABLES: var1, var2
 ERRORS: ErrorType1, ErrorType2
 CONCEPTS: concept1, concept2
 """
+
+    def extract_keywords_from_issue(self, issue_text: str) -> Dict[str, List[str]]:
+        prompt = self._build_keywords_prompt(issue_text)
+
         response = self.llm.get_completion(
+            system_prompt="You are a code analysis expert.",
+            user_prompt=prompt,
+            temperature=0.2,
+            max_tokens=500,
+            stream=True,
+            stop_when=self._keywords_complete
+        )
+
+        return self._parse_keywords_response(response)
+
+    async def aextract_keywords_from_issue(self, issue_text: str) -> Dict[str, List[str]]:
+        prompt = self._build_keywords_prompt(issue_text)
+
+        response = await self.llm.aget_completion(
             system_prompt="You are a code analysis expert.",
             user_prompt=prompt,
             temperature=0.2,
             max_tokens=500
         )
 
+        return self._parse_keywords_response(response)
+
+    def _parse_keywords_response(self, response: str) -> Dict[str, List[str]]:
         keywords = {
             'functions': [],
             'classes': [],
@@ -56,44 +138,56 @@ CONCEPTS: concept1, concept2
                 keywords['errors'] = [k.strip() for k in line.replace('ERRORS:', '').split(',') if k.strip()]
             elif line.startswith('CONCEPTS:'):
                 keywords['concepts'] = [k.strip() for k in line.replace('CONCEPTS:', '').split(',') if k.strip()]
-        
+
         logger.info(f"Extracted keywords: {keywords}")
         return keywords
-    
+
+    async def aanalyze_issue(
+        self,
+        issue_text: str,
+        file_tree: str,
+        max_files: int = 5
+    ) -> Tuple[Dict[str, List[str]], List[str]]:
+        """Run keyword extraction and file ranking concurrently.
+
+        The two LLM calls are independent, so gathering them hides one
+        full round-trip behind the other.
+        """
+        return await asyncio.gather(
+            self.aextract_keywords_from_issue(issue_text),
+            self.asearch_files_by_relevance(issue_text, file_tree, max_files=max_files)
+        )
+
     def parse_python_file(self, file_content: str) -> Dict[str, any]:
         try:
-            tree = ast.parse(file_content)
-
-            structure = {
-                'classes': [],
-                'functions': [],
-                'imports': []
-            }
-
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    methods = [m.name for m in node.body if isinstance(m, ast.FunctionDef)]
-                    structure['classes'].append({
-                        'name': node.name,
-                        'lineno': node.lineno,
-                        'methods': methods,
-                        'docstring': ast.get_docstring(node)
-                    })
-                elif isinstance(node, ast.FunctionDef):
-                    if node.col_offset == 0:
-                        structure['functions'].append({
-                            'name': node.name,
-                            'lineno': node.lineno,
-                            'docstring': ast.get_docstring(node)
-                        })
-                elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                    structure['imports'].append(node.lineno)
-            
-            return structure
+            return _parse_python_structure(file_content)
         except SyntaxError as e:
             logger.warning(f"Could not parse file: {e}")
             return None
-        
+
+    def parse_many(self, contents: Dict[str, str], large_threshold: int = 50_000) -> Dict[str, Optional[Dict]]:
+        """Parse several files, fanning large ones out to worker processes.
+
+        Small files are parsed inline because process spawn overhead
+        would dominate; big files get min(K, cores) parallelism.
+        """
+        small = {p: c for p, c in contents.items() if len(c) <= large_threshold}
+        large = {p: c for p, c in contents.items() if len(c) > large_threshold}
+
+        results = {path: self.parse_python_file(content) for path, content in small.items()}
+
+        if large:
+            try:
+                with ProcessPoolExecutor(max_workers=min(len(large), os.cpu_count() or 1)) as ex:
+                    for path, structure in zip(large, ex.map(_parse_python_structure_safe, large.values())):
+                        results[path] = structure
+            except Exception as e:
+                logger.warning(f"Parallel parse failed, parsing inline: {e}")
+                for path, content in large.items():
+                    results[path] = self.parse_python_file(content)
+
+        return results
+
     def extract_relevant_sections(
         self, 
         file_content: str, 
@@ -110,35 +204,47 @@ CONCEPTS: concept1, concept2
         included_lines = set()
         sections_info = []
 
+        # lowercase every keyword once up front instead of per item in
+        # the scoring loop
+        keywords_lc = {cat: [k.lower() for k in lst] for cat, lst in keywords.items()}
+        all_keywords = {k for lst in keywords_lc.values() for k in lst}
+
+        automaton = self._build_keyword_automaton(keywords_lc)
         scored_items = []
 
         for cls in structure['classes']:
             score = self._score_relevance(
-                cls['name'], 
-                cls['methods'], 
+                cls['name'],
+                cls['methods'],
                 cls.get('docstring', ''),
-                keywords
+                keywords_lc,
+                automaton=automaton,
+                all_keywords=all_keywords
             )
             if score > 0:
                 scored_items.append({
                     'type': 'class',
                     'name': cls['name'],
                     'lineno': cls['lineno'],
+                    'end_lineno': cls.get('end_lineno'),
                     'score': score
                 })
         
         for func in structure['functions']:
             score = self._score_relevance(
-                func['name'], 
-                [], 
+                func['name'],
+                [],
                 func.get('docstring', ''),
-                keywords
+                keywords_lc,
+                automaton=automaton,
+                all_keywords=all_keywords
             )
             if score > 0:
                 scored_items.append({
                     'type': 'function',
                     'name': func['name'],
                     'lineno': func['lineno'],
+                    'end_lineno': func.get('end_lineno'),
                     'score': score
                 })
 
@@ -152,7 +258,9 @@ CONCEPTS: concept1, concept2
             if current_chars >= max_chars:
                 break
             
-            section, section_lines = self._extract_code_block(lines, item['lineno'])
+            section, section_lines = self._extract_code_block(
+                lines, item['lineno'], item.get('end_lineno')
+            )
             section_chars = len(section)
 
             if current_chars + section_chars <= max_chars:
@@ -169,67 +277,137 @@ CONCEPTS: concept1, concept2
         logger.info(f"Extracted {len(relevant_sections)} sections ({current_chars} chars)")
         return result, sections_info
     
+    def _build_keyword_automaton(self, keywords: Dict[str, List[str]]):
+        # one automaton per issue matches every keyword in a single pass
+        # over each name/docstring, instead of K substring scans per item
+        if ahocorasick is None:
+            return None
+
+        automaton = ahocorasick.Automaton()
+        for category, keyword_list in keywords.items():
+            for keyword in keyword_list:
+                kw = keyword.lower()
+                if not kw:
+                    continue
+                existing = automaton.get(kw, None)
+                if existing:
+                    existing[1].add(category)
+                else:
+                    automaton.add_word(kw, (kw, {category}))
+
+        if len(automaton) == 0:
+            return None
+
+        automaton.make_automaton()
+        return automaton
+
+    def _matched_keywords(self, automaton, text: str) -> Dict[str, set]:
+        matched = {}
+        for _, (kw, categories) in automaton.iter(text):
+            matched[kw] = categories
+        return matched
+
+    def _score_relevance_automaton(
+        self,
+        automaton,
+        name: str,
+        methods: List[str],
+        docstring: str
+    ) -> int:
+        score = 0
+        name_lower = name.lower()
+        docstring_lower = (docstring or '').lower()
+
+        for categories in self._matched_keywords(automaton, name_lower).values():
+            if 'functions' in categories or 'classes' in categories:
+                score += 10
+            if 'errors' in categories:
+                score += 8
+
+        if methods:
+            methods_lower = ' '.join(methods).lower()
+            for categories in self._matched_keywords(automaton, methods_lower).values():
+                if 'functions' in categories:
+                    score += 5
+
+        if docstring_lower:
+            for categories in self._matched_keywords(automaton, docstring_lower).values():
+                score += 2 * len(categories)
+                if 'errors' in categories:
+                    score += 8
+
+        return score
+
     def _score_relevance(
         self,
-        name: str, 
-        methods: List[str], 
+        name: str,
+        methods: List[str],
         docstring: str,
-        keywords: Dict[str, List[str]]
+        keywords: Dict[str, List[str]],
+        automaton=None,
+        all_keywords=None
     ) -> int:
+        # keywords are expected pre-lowercased by the caller
+        if automaton is not None:
+            return self._score_relevance_automaton(automaton, name, methods, docstring)
+
         score = 0
         name_lower = name.lower()
         docstring_lower = (docstring or'').lower()
+        methods_lower = [m.lower() for m in methods]
+
+        if all_keywords is None:
+            all_keywords = {k for lst in keywords.values() for k in lst}
 
         for keyword in keywords.get('functions', []) + keywords.get('classes', []):
-            if keyword.lower() in name_lower:
+            if keyword in name_lower:
                 score += 10
 
-        for method in methods:
+        for method in methods_lower:
             for keyword in keywords.get('functions', []):
-                if keyword.lower() in method.lower():
+                if keyword in method:
                     score += 5
-        
-        for keyword_list in keywords.values():
-            for keyword in keyword_list:
-                if keyword.lower() in docstring_lower:
-                    score += 2
-        
+
+        # tokenize the docstring once; set intersection replaces the
+        # category x keyword substring scan
+        if docstring_lower:
+            doc_words = set(_WORD_RE.findall(docstring_lower))
+            score += 2 * len(doc_words & all_keywords)
+
         for error in keywords.get('errors', []):
-            if error.lower() in name_lower or error.lower() in docstring_lower:
+            if error in name_lower or error in docstring_lower:
                 score += 8
-        
+
         return score
     
-    def _extract_code_block(self, lines: List[str], start_lineno: int) -> Tuple[str, set]:
+    def _extract_code_block(self, lines: List[str], start_lineno: int, end_lineno: Optional[int] = None) -> Tuple[str, set]:
         if start_lineno > len(lines):
             return "", set()
-        
+
         start_idx = start_lineno - 1
-        base_indent = len(lines[start_idx]) - len(lines[start_idx].lstrip())
-
-        end_idx = start_idx + 1
-        while end_idx < len(lines):
-            line = lines[end_idx]
-            if line.strip(): 
-                indent = len(line) - len(line.lstrip())
-                if indent <= base_indent:
-                    break
-            end_idx += 1
-        
+
+        if end_lineno is not None:
+            # the AST already knows the block extent, no indent scan needed
+            end_idx = min(end_lineno, len(lines))
+        else:
+            base_indent = len(lines[start_idx]) - len(lines[start_idx].lstrip())
+
+            end_idx = start_idx + 1
+            while end_idx < len(lines):
+                line = lines[end_idx]
+                if line.strip():
+                    indent = len(line) - len(line.lstrip())
+                    if indent <= base_indent:
+                        break
+                end_idx += 1
+
         section_lines = set(range(start_idx, end_idx))
         section_text = '\n'.join(lines[start_idx:end_idx])
-        
+
         return section_text, section_lines
     
-    def search_files_by_relevance(
-        self,
-        issue_text: str,
-        file_tree: str,
-        max_files: int = 5
-    ) -> List[str]:
-        """Use LLM to rank files by relevance"""
-        
-        prompt = f"""Given this GitHub issue, identify which files are most likely to need modification.
+    def _build_relevance_prompt(self, issue_text: str, file_tree: str, max_files: int) -> str:
+        return f"""Given this GitHub issue, identify which files are most likely to need modification.
 
 Issue:
 {issue_text[:1500]}
@@ -245,22 +423,52 @@ Consider:
 
 Respond with ONLY the file paths, one per line, ranked from most to least relevant.
 """
-        
+
+    def search_files_by_relevance(
+        self,
+        issue_text: str,
+        file_tree: str,
+        max_files: int = 5
+    ) -> List[str]:
+        """Use LLM to rank files by relevance"""
+
+        prompt = self._build_relevance_prompt(issue_text, file_tree, max_files)
+
         response = self.llm.get_completion(
             system_prompt="You are a software debugging expert.",
             user_prompt=prompt,
             temperature=0.2,
             max_tokens=500
         )
-    
+
+        return self._parse_files_response(response, max_files)
+
+    async def asearch_files_by_relevance(
+        self,
+        issue_text: str,
+        file_tree: str,
+        max_files: int = 5
+    ) -> List[str]:
+        prompt = self._build_relevance_prompt(issue_text, file_tree, max_files)
+
+        response = await self.llm.aget_completion(
+            system_prompt="You are a software debugging expert.",
+            user_prompt=prompt,
+            temperature=0.2,
+            max_tokens=500
+        )
+
+        return self._parse_files_response(response, max_files)
+
+    def _parse_files_response(self, response: str, max_files: int) -> List[str]:
         files = []
         for line in response.split('\n'):
             line = line.strip()
             line = re.sub(r'^\d+[\.\)]\s*', '', line)
             line = re.sub(r'^[-\*]\s*', '', line)
             line = line.strip('`"\'')
-            
+
             if line and '.py' in line and not line.startswith('#'):
                 files.append(line)
-        
+
         return files[:max_files]
\ No newline at end of file
@@ -1,12 +1,15 @@
 from typing import List, Dict, Tuple, Optional
 import time
+from collections import deque
 from sudodev.core.utils.logger import log_step, log_success, log_error, setup_logger
 logger = setup_logger(__name__)
 
 class FeedbackLoop:
     def __init__(self, max_attempts: int = 3):
         self.max_attempts = max_attempts
-        self.attempts_history = []
+        # only the last max_attempts entries ever feed the retry prompt,
+        # so a bounded ring keeps memory flat however long the run gets
+        self.attempts_history = deque(maxlen=max_attempts)
 
     def add_attempt(
         self,
@@ -21,7 +24,8 @@ class FeedbackLoop:
             'attempt': attempt_num,
             'file_path': file_path,
             'code_applied': code_applied[:500],
-            'error_output': error_output,
+            # keep the tail only; retry prompts never use more than this
+            'error_output': error_output[-16384:],
             'success': success,
             'timestamp': time.time()
         })
@@ -138,7 +142,7 @@ Error Analysis:
         
         if len(self.attempts_history) > 0:
             prompt += f"\n**Previous Attempts**: {len(self.attempts_history)} failed\n"
-            for i, attempt in enumerate(self.attempts_history[-2:], 1):
+            for i, attempt in enumerate(list(self.attempts_history)[-2:], 1):
                 brief_error = attempt['error_output'][:200].split('\n')[-1]
                 prompt += f"  Attempt {attempt['attempt']}: {brief_error}\n"
         
@@ -0,0 +1,124 @@
+import os
+import re
+import json
+from pathlib import Path
+from typing import Dict, Optional
+from sudodev.core.utils.logger import setup_logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+logger = setup_logger(__name__)
+
+DEFAULT_CACHE_DIR = Path(os.getenv("SUDODEV_CACHE_DIR", Path.home() / ".cache" / "sudodev")) / "semantic"
+
+_SLUG_RE = re.compile(r'[^a-zA-Z0-9_-]+')
+
+
+class SemanticCache:
+    """Reuse keywords/target files across near-duplicate issues.
+
+    Problem statements on benchmark sweeps are often near-identical
+    (same repo, similar wording). Each statement is embedded once; if
+    cosine similarity to a previously seen issue in the same repo
+    clears the threshold, the stored analysis is returned instead of
+    re-prompting the LLM. Degrades to a no-op when numpy or
+    sentence-transformers is not installed.
+    """
+
+    MODEL_NAME = "all-MiniLM-L6-v2"
+
+    def __init__(self, cache_dir: str = None, threshold: float = 0.95):
+        self.threshold = threshold
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.available = np is not None and SentenceTransformer is not None
+        self._model = None
+        self._store: Dict[str, dict] = {}
+
+        if not self.available:
+            logger.info("semantic cache disabled (numpy/sentence-transformers not installed)")
+
+    def _embed(self, text: str):
+        if self._model is None:
+            self._model = SentenceTransformer(self.MODEL_NAME)
+        emb = self._model.encode(text)
+        return emb / (np.linalg.norm(emb) + 1e-12)
+
+    def _repo_slug(self, repo: str) -> str:
+        return _SLUG_RE.sub('-', repo or 'unknown')
+
+    def _load_repo(self, repo: str) -> dict:
+        slug = self._repo_slug(repo)
+        if slug in self._store:
+            return self._store[slug]
+
+        path = self.cache_dir / f"{slug}.npz"
+        if path.exists():
+            try:
+                data = np.load(path, allow_pickle=False)
+                self._store[slug] = {
+                    'embeddings': data['embeddings'],
+                    'entries': json.loads(str(data['entries']))
+                }
+                return self._store[slug]
+            except Exception as e:
+                logger.warning(f"could not load semantic cache for {repo}: {e}")
+
+        self._store[slug] = {'embeddings': None, 'entries': []}
+        return self._store[slug]
+
+    def _save_repo(self, repo: str):
+        slug = self._repo_slug(repo)
+        bucket = self._store[slug]
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            np.savez(
+                self.cache_dir / f"{slug}.npz",
+                embeddings=bucket['embeddings'],
+                entries=json.dumps(bucket['entries'])
+            )
+        except Exception as e:
+            logger.warning(f"could not persist semantic cache for {repo}: {e}")
+
+    def lookup(self, repo: str, problem_statement: str) -> Optional[dict]:
+        if not self.available:
+            return None
+
+        try:
+            bucket = self._load_repo(repo)
+            if bucket['embeddings'] is None or not bucket['entries']:
+                return None
+
+            emb = self._embed(problem_statement)
+            sims = bucket['embeddings'] @ emb
+            best = int(sims.argmax())
+            if sims[best] >= self.threshold:
+                logger.info(f"semantic cache hit (similarity {sims[best]:.3f})")
+                return bucket['entries'][best]
+        except Exception as e:
+            logger.warning(f"semantic cache lookup failed: {e}")
+
+        return None
+
+    def store(self, repo: str, problem_statement: str, entry: dict):
+        if not self.available:
+            return
+
+        try:
+            bucket = self._load_repo(repo)
+            emb = self._embed(problem_statement)
+            if bucket['embeddings'] is None:
+                bucket['embeddings'] = emb[None, :]
+            else:
+                bucket['embeddings'] = np.vstack([bucket['embeddings'], emb])
+            bucket['entries'].append(entry)
+            self._save_repo(repo)
+        except Exception as e:
+            logger.warning(f"semantic cache store failed: {e}")
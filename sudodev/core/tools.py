@@ -1,27 +1,78 @@
+import io
 import re
-import difflib 
+import difflib
 import ast
+from functools import lru_cache
 from typing import List, Tuple, Dict, Optional
 
-def extract_python_code(text: str) -> str:
-    pattern = r"```(?:python3|python|py)\b\s*(.*?)```"
-    matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
-
-    if matches:
-        return matches[0].strip()
-    
-    pattern = r"```\s*(.*?)```"
-    matches = re.findall(pattern, text, re.DOTALL)
+# compiled once at import so hot extraction paths never pay the
+# re-parse cost (or risk eviction from re's bounded internal cache)
+_PY_CODE_RE = re.compile(r"```(?:python3|python|py)\b\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_GENERIC_CODE_RE = re.compile(r"```\s*(.*?)```", re.DOTALL)
+_ANY_LANG_CODE_RE = re.compile(r"```.*?\s*(.*?)```", re.DOTALL)
+_BASH_RE = re.compile(r"```(?:bash|sh)\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+# one alternation covers bare paths plus backtick/quote-wrapped ones,
+# so the text is scanned once instead of three times
+_FILE_PATH_RE = re.compile(r'[`"]?([a-zA-Z0-9_/\-\.]+\.py)\b')
+_PATCH_FILE_RE = re.compile(r'[ab]/(.*?)(?:\s|$)')
+_HUNK_HEADER_RE = re.compile(r'@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@')
+_ERROR_RE = re.compile(r'((?:\w+Error|\w*Exception)): (.+?)(?=\n|$)')
+_CODE_BLOCK_RE = re.compile(r"```(?:\w+)?\n([\s\S]*?)```", re.MULTILINE)
+_PREFIX_RE = re.compile(
+    r"""^\s*(
+        here[’']?s the code[:!]? |
+        here is the code[:!]? |
+        sure[,!]? here[’']?s |
+        sure[,!]? |
+        certainly[,!]? |
+        below is the code[:!]?
+    )\s*""",
+    re.IGNORECASE | re.VERBOSE
+)
+
+@lru_cache(maxsize=128)
+def _extract_python_code_cached(text: str) -> str:
+    # single forward scan with str.find instead of regex: no backtracking
+    # and no match-object allocation on multi-KB responses
+    lower = text.lower()
+    n = len(text)
+
+    # first look for a python-tagged fence with a closing fence
+    i = 0
+    while True:
+        i = lower.find('```', i)
+        if i == -1:
+            break
+        j = i + 3
+        k = j
+        while k < n and (lower[k].isalnum() or lower[k] == '_'):
+            k += 1
+        if lower[j:k] in ('python3', 'python', 'py'):
+            end = text.find('```', k)
+            if end == -1:
+                break
+            return text[k:end].strip()
+        i = j
+
+    # fall back to the first fenced block of any kind
+    start = text.find('```')
+    if start != -1:
+        end = text.find('```', start + 3)
+        if end != -1:
+            return text[start + 3:end].strip()
 
-    if matches:
-        return matches[0].strip()
-    
     return text.strip()
 
+def extract_python_code(text: str) -> str:
+    # cached LLM responses make repeat extractions on identical text
+    # common in retry loops; huge inputs bypass the cache
+    if len(text) > 1_000_000:
+        return _extract_python_code_cached.__wrapped__(text)
+    return _extract_python_code_cached(text)
+
 def extract_bash_commands(text: str) -> List[str]:
     commands = []
-    pattern = r"```(?:bash|sh)\s*(.*?)```"
-    matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
+    matches = _BASH_RE.findall(text)
     for match in matches:
         lines = match.strip().split('\n')
         for line in lines:
@@ -39,32 +90,12 @@ def extract_bash_commands(text: str) -> List[str]:
     return commands
 
 def extract_file_paths(text: str) -> List[str]:
-    patterns = [
-        r'`([a-zA-Z0-9_/\-\.]+\.py)`',  # Paths in backticks
-        r'([a-zA-Z0-9_/\-\.]+\.py)\b',   # Standalone .py files
-        r'"([a-zA-Z0-9_/\-\.]+\.py)"',   # Paths in quotes
-    ]
-
-    paths = []
-    for pattern in patterns:
-        matches = re.findall(pattern, text)
-        paths.extend(matches)
-
-    seen = set()
-    unique_paths = []
-    for path in paths:
-        if path not in seen:
-            seen.add(path)
-            unique_paths.append(path)
-    
-    return unique_paths
-
-def build_reproduce_prompt(issue_desc: str, hints: str = None) -> str:
-    prompt = f"""You are a software testing expert. Your task is to write a Python script that reproduces the bug described below.
-
-Issue Description:
-{issue_desc}
+    # dict preserves insertion order, so this dedups in one pass
+    return list(dict.fromkeys(_FILE_PATH_RE.findall(text)))
 
+# static prompt sections live at module level so each call only
+# interpolates the dynamic pieces and does one final join
+_REPRODUCE_FOOTER = """
 Requirements:
 1. Write a complete, runnable Python script
 2. The script should clearly demonstrate the bug
@@ -75,13 +106,40 @@ Requirements:
 Output Format:
 Provide only the Python code wrapped in ```python blocks, nothing else.
 """
+
+_FIX_FOOTER = """
+Your Task:
+1. Identify the root cause of the bug
+2. Provide the COMPLETE fixed version of the file
+3. Explain what you changed and why
+
+Output Format:
+First explain your changes briefly, then provide the complete fixed code in a ```python block.
+"""
+
+_LOCATE_FOOTER = """
+Your Task:
+List the file paths that likely need modification to fix this issue.
+
+Output Format:
+Provide a list of file paths, one per line, like:
+path/to/file1.py
+path/to/file2.py
+"""
+
+def build_reproduce_prompt(issue_desc: str, hints: str = None) -> str:
+    parts = [f"""You are a software testing expert. Your task is to write a Python script that reproduces the bug described below.
+
+Issue Description:
+{issue_desc}
+""", _REPRODUCE_FOOTER]
     if hints:
-        prompt += f"\nHints:\n{hints}\n"
+        parts.append(f"\nHints:\n{hints}\n")
 
-    return prompt
+    return "".join(parts)
 
 def build_fix_prompt(issue: str, file_content: str, file_path: str, error_trace: str = None) -> str:
-    prompt = f"""You are an expert software engineer. Fix the bug in the following code.
+    parts = [f"""You are an expert software engineer. Fix the bug in the following code.
 Issue Description:
 {issue}
 
@@ -90,40 +148,25 @@ File to fix: {file_path}
 ```python
 {file_content}
 ```
-"""
+"""]
     if error_trace:
-        prompt += f"\n**Error Trace:**\n```\n{error_trace}\n```\n"
+        parts.append(f"\n**Error Trace:**\n```\n{error_trace}\n```\n")
 
-    prompt += """
-Your Task:
-1. Identify the root cause of the bug
-2. Provide the COMPLETE fixed version of the file
-3. Explain what you changed and why
-
-Output Format:
-First explain your changes briefly, then provide the complete fixed code in a ```python block.
-"""
+    parts.append(_FIX_FOOTER)
 
-    return prompt
+    return "".join(parts)
 
 def build_locate_files_prompt(issue: str, repo_structure: str = None) -> str:
-    prompt = f"""You are analyzing a software bug report. Identify which source files need to be modified to fix this issue.
+    parts = [f"""You are analyzing a software bug report. Identify which source files need to be modified to fix this issue.
 Issue Description:
 {issue}
-"""
+"""]
     if repo_structure:
-        prompt += f"\n**Repository Structure:**\n```\n{repo_structure}\n```\n"
+        parts.append(f"\n**Repository Structure:**\n```\n{repo_structure}\n```\n")
 
-    prompt += """
-Your Task:
-List the file paths that likely need modification to fix this issue.
+    parts.append(_LOCATE_FOOTER)
 
-Output Format:
-Provide a list of file paths, one per line, like:
-path/to/file1.py
-path/to/file2.py
-"""
-    return prompt
+    return "".join(parts)
 
 def build_verification_prompt(issue: str, fix_applied: str, test_output: str) -> str:
     prompt = f"""You are verifying whether a bug fix successfully resolves an issue.
@@ -153,72 +196,90 @@ REASONING: [Your explanation]
     return prompt
 
 def create_diff_patch(original: str, modified: str, filepath: str) -> str:
-    original_lines = original.splitlines(keepends=True)
-    modified_lines = modified.splitlines(keepends=True)
-
-    diff = difflib.unified_diff(
-        original_lines,
-        modified_lines,
+    # stream the generator straight into a StringIO instead of collecting
+    # a diff list and concatenating it — avoids one extra copy of the diff
+    buf = io.StringIO()
+    buf.writelines(difflib.unified_diff(
+        original.splitlines(keepends=True),
+        modified.splitlines(keepends=True),
         fromfile=f"a/{filepath}",
         tofile=f"b/{filepath}",
         lineterm='\n'
-    )
+    ))
 
-    return ''.join(diff)
+    return buf.getvalue()
 
 def parse_patch(patch_text: str) -> Dict[str, any]:
-    lines = patch_text.split('\n')
     result = {
         'filepath': None,
         'additions': [],
-        'deletions': []
+        'deletions': [],
+        'hunks': []
     }
 
+    hunks = result['hunks']
+    additions = result['additions']
+    deletions = result['deletions']
     current_hunk = None
 
-    for line in lines:
-        if line.startswith('---') or line.startswith('+++'):
-            match = re.search(r'[ab]/(.*?)(?:\s|$)', line)
-            if match:
-                result['filepath'] = match.group(1)
-        elif line.startswith('@@'):
-            if current_hunk:
-                result['hunks'].append(current_hunk)
-
-            header_match = re.search(
-                r'@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@', line
-            )
-
-            current_hunk = {
-                'header': line,
-                'old_start': int(header_match.group(1)),
-                'old_count': int(header_match.group(2) or 1),
-                'new_start': int(header_match.group(3)),
-                'new_count': int(header_match.group(4) or 1),
-                'lines': []
-            }
-
-
-        elif line.startswith('+') and not line.startswith('+++'):
-            result['additions'].append(line[1:])
-            if current_hunk:
-                current_hunk['lines'].append(line)
-
-        elif line.startswith('-') and not line.startswith('---'):
-            result['deletions'].append(line[1:])
-            if current_hunk:
-                current_hunk['lines'].append(line)
-        
-        elif line.startswith(' '):
+    # single pass dispatching on the first character; each finished hunk
+    # is flushed exactly once, at the next @@ boundary or at EOF
+    for line in patch_text.split('\n'):
+        if not line:
+            continue
+
+        c = line[0]
+
+        if c == '@':
+            if line.startswith('@@'):
+                if current_hunk:
+                    hunks.append(current_hunk)
+
+                header_match = _HUNK_HEADER_RE.search(line)
+                if not header_match:
+                    current_hunk = None
+                    continue
+
+                current_hunk = {
+                    'header': line,
+                    'old_start': int(header_match.group(1)),
+                    'old_count': int(header_match.group(2) or 1),
+                    'new_start': int(header_match.group(3)),
+                    'new_count': int(header_match.group(4) or 1),
+                    'lines': []
+                }
+
+        elif c == '+':
+            if line.startswith('+++'):
+                match = _PATCH_FILE_RE.search(line)
+                if match:
+                    result['filepath'] = match.group(1)
+            else:
+                additions.append(line[1:])
+                if current_hunk:
+                    current_hunk['lines'].append(line)
+
+        elif c == '-':
+            if line.startswith('---'):
+                match = _PATCH_FILE_RE.search(line)
+                if match:
+                    result['filepath'] = match.group(1)
+            else:
+                deletions.append(line[1:])
+                if current_hunk:
+                    current_hunk['lines'].append(line)
+
+        elif c == ' ':
             if current_hunk:
                 current_hunk['lines'].append(line)
 
-        if current_hunk:
-            result['hunk'].append(current_hunk)
+    if current_hunk:
+        hunks.append(current_hunk)
 
     return result
 
-def validate_python_code(code: str) -> Tuple[bool, str]:
+@lru_cache(maxsize=256)
+def _validate_python_code_cached(code: str) -> Tuple[bool, str]:
     try:
         ast.parse(code)
         return True, ""
@@ -227,27 +288,21 @@ def validate_python_code(code: str) -> Tuple[bool, str]:
     except Exception as e:
         return False, f"Parsing Error: {str(e)}"
 
+def validate_python_code(code: str) -> Tuple[bool, str]:
+    # retry loops re-validate near-identical candidates; cache the parse
+    # result, but keep huge one-off files out of the cache
+    if len(code) > 1_000_000:
+        return _validate_python_code_cached.__wrapped__(code)
+    return _validate_python_code_cached(code)
+
 def extract_error_messages(output: str) -> List[Dict[str, str]]:
-    errors = []
-    exception_pattern = r'(\w+Error|Exception): (.+?)(?=\n|$)'
-    matches = re.findall(exception_pattern, output)
-
-    for error_type, message in matches:
-        errors.append({
-            'type': error_type,
-            'message': message.strip()
-        })
-    
-    assertion_pattern = r'AssertionError: (.+?)(?=\n|$)'
-    assertion_matches = re.findall(assertion_pattern, output)
-    
-    for message in assertion_matches:
-        errors.append({
-            'type': 'AssertionError',
-            'message': message.strip()
-        })
-    
-    return errors
+    # one alternation covers *Error, Exception, and *Exception; the old
+    # second AssertionError pass was a strict subset of the first and
+    # double-reported every assertion failure
+    return [
+        {'type': error_type, 'message': message.strip()}
+        for error_type, message in _ERROR_RE.findall(output)
+    ]
 
 def format_test_results(results: Dict[str, any]) -> str:
     output = []
@@ -269,31 +324,13 @@ def format_test_results(results: Dict[str, any]) -> str:
     
     return "\n".join(output)
 
-import re
 
 def clean_llm_response(text: str) -> str:
-    
-    code_block_pattern = re.compile(
-        r"```(?:\w+)?\n([\s\S]*?)```",
-        re.MULTILINE
-    )
-    match = code_block_pattern.search(text)
+    match = _CODE_BLOCK_RE.search(text)
     if match:
         return match.group(1).strip()
 
-    prefix_pattern = re.compile(
-        r"""^\s*(
-            here[’']?s the code[:!]? |
-            here is the code[:!]? |
-            sure[,!]? here[’']?s |
-            sure[,!]? |
-            certainly[,!]? |
-            below is the code[:!]?
-        )\s*""",
-        re.IGNORECASE | re.VERBOSE
-    )
-
-    text = re.sub(prefix_pattern, "", text)
+    text = _PREFIX_RE.sub("", text)
 
     return text.strip()
 
@@ -307,8 +344,7 @@ def extract_code_from_response(response: str, language: str = "python") -> str:
         commands = extract_bash_commands(response)
         return '\n'.join(commands)
     else:
-        pattern = r"```.*?\s*(.*?)```"
-        matches = re.findall(pattern, response, re.DOTALL)
+        matches = _ANY_LANG_CODE_RE.findall(response)
         if matches:
             return matches[0].strip()
     
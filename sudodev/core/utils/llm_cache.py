@@ -0,0 +1,87 @@
+import os
+import time
+import hashlib
+import sqlite3
+from pathlib import Path
+from sudodev.core.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_CACHE_PATH = Path(os.getenv("SUDODEV_CACHE_DIR", Path.home() / ".cache" / "sudodev")) / "responses.db"
+
+
+def cache_enabled() -> bool:
+    """Whether the on-disk LLM cache is enabled (SUDODEV_LLM_CACHE, on by default)"""
+    return os.getenv("SUDODEV_LLM_CACHE", "1") not in ("0", "false", "no")
+
+
+def make_key(*parts) -> bytes:
+    payload = "\0".join(str(p) for p in parts)
+    return hashlib.blake2b(payload.encode()).digest()
+
+
+class LLMCache:
+    """Content-addressed on-disk store for LLM responses.
+
+    Keys are hashes of the full request (model, prompts, sampling
+    params); entries expire after a TTL. All failures degrade to a
+    cache miss so the caller never breaks on cache trouble.
+    """
+
+    def __init__(self, path: str = None, ttl: int = 24 * 3600):
+        self.ttl = ttl
+        self._db = None
+        try:
+            path = Path(path) if path else DEFAULT_CACHE_PATH
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key BLOB PRIMARY KEY, response TEXT, ts INT)"
+            )
+            self._db.execute("DELETE FROM responses WHERE ts < ?", (int(time.time()) - ttl,))
+            self._db.commit()
+            logger.info(f"response cache enabled at {path}")
+        except Exception as e:
+            logger.warning(f"could not open response cache, continuing without it: {e}")
+            self._db = None
+
+    def get(self, key: bytes):
+        if not self._db:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT response, ts FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] >= int(time.time()) - self.ttl:
+                return row[0]
+        except Exception as e:
+            logger.warning(f"cache lookup failed: {e}")
+        return None
+
+    def put(self, key: bytes, response: str):
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, ts) VALUES (?, ?, ?)",
+                (key, response, int(time.time()))
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"cache store failed: {e}")
+
+    def get_or_compute(self, key: bytes, fn):
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        result = fn()
+        self.put(key, result)
+        return result
+
+    def close(self):
+        if self._db:
+            try:
+                self._db.close()
+            except Exception as e:
+                logger.warning(f"failed to close response cache: {e}")
+            self._db = None
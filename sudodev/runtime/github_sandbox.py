@@ -1,11 +1,24 @@
 import docker
 import tarfile
 import io
+import os
 import time
+import functools
+import hashlib
+import re
+import tempfile
+import subprocess
+from pathlib import Path
+from urllib.parse import urlsplit
+from sudodev.runtime.container import _ChunkReader, _TAR_BUFSIZE
 from sudodev.core.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# build-log lines worth surfacing; everything else (pip download traces
+# etc.) is drained without touching the logging machinery
+_BUILD_LOG_RE = re.compile(r'^Step |error|ERROR|Successfully')
+
 class GitHubSandbox:
     """Sandbox for arbitrary GitHub repositories"""
     
@@ -17,17 +30,88 @@ class GitHubSandbox:
         self.repo_name = self._extract_repo_name(github_url)
         self.image_name = f"sudodev-github-{self.repo_name}:latest"
         
-    def _extract_repo_name(self, url: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _extract_repo_name(url: str) -> str:
         """Extract repo name from GitHub URL"""
         # https://github.com/user/repo.git -> user-repo
-        parts = url.rstrip('/').rstrip('.git').split('/')
-        return f"{parts[-2]}-{parts[-1]}".lower()
+        # urlsplit + removesuffix instead of chained rstrip: rstrip('.git')
+        # strips any of the chars '.', 'g', 'i', 't' and mangled repo
+        # names ending in those letters
+        path = urlsplit(url).path.removesuffix('.git').strip('/')
+        user, repo = path.split('/')[-2:]
+        return f"{user}-{repo}".lower()
     
     def build_image(self):
         """Build Docker image with the GitHub repo"""
         logger.info(f"Building Docker image for {self.github_url}...")
-        
-        # Create Dockerfile content
+
+        # BuildKit variant: one merged pip layer with a persistent wheel
+        # cache, so rebuilding the same repo skips downloads and compiles
+        buildkit_dockerfile = f"""# syntax=docker/dockerfile:1.4
+FROM python:3.12-slim
+
+RUN apt-get update && apt-get install -y \\
+    git \\
+    build-essential \\
+    && rm -rf /var/lib/apt/lists/*
+
+WORKDIR /testbed
+
+# Clone the repository
+RUN git clone --depth 1 --branch {self.branch} {self.github_url} /testbed
+
+# Install dependencies in order of priority; the cache mount replaces
+# --no-cache-dir, keeping wheels across builds without bloating layers
+RUN --mount=type=cache,target=/root/.cache/pip,sharing=locked \\
+    if [ -f requirements.txt ]; then pip install -r requirements.txt || true; fi; \\
+    if [ -f setup.py ] || [ -f pyproject.toml ]; then pip install -e . || true; fi
+
+CMD ["/bin/bash"]
+"""
+
+        # skip the daemon entirely when an image built from an identical
+        # Dockerfile already exists (inputs are hashed into a label)
+        digest = hashlib.sha256(buildkit_dockerfile.encode()).hexdigest()[:12]
+        buildkit_dockerfile += f'\nLABEL sudodev.dockerfile="{digest}"\n'
+        try:
+            existing = self.client.images.get(self.image_name)
+            if existing.labels.get('sudodev.dockerfile') == digest:
+                logger.info(f"Image {self.image_name} is up to date, skipping build")
+                return True
+        except docker.errors.ImageNotFound:
+            pass
+        except Exception:
+            pass
+
+        # a persistent on-disk build context (instead of an in-memory
+        # fileobj) lets the daemon's content-addressed layer cache hit
+        # across processes and restarts
+        ctx = Path(tempfile.gettempdir()) / "sudodev-ctx" / self.repo_name
+        ctx.mkdir(parents=True, exist_ok=True)
+        (ctx / "Dockerfile").write_text(buildkit_dockerfile)
+
+        try:
+            proc = subprocess.run(
+                ["docker", "build", "-t", self.image_name, str(ctx)],
+                env=dict(os.environ, DOCKER_BUILDKIT="1"),
+                capture_output=True,
+                timeout=1800
+            )
+            if proc.returncode == 0:
+                logger.info(f"Successfully built image: {self.image_name}")
+                return True
+            tail = proc.stderr.decode('utf-8', errors='replace')[-2000:]
+            logger.warning(f"BuildKit build failed, falling back to legacy builder:\n{tail}")
+        except FileNotFoundError:
+            logger.warning("docker CLI not found; using legacy builder")
+        except Exception as e:
+            logger.warning(f"BuildKit build failed: {e}")
+
+        return self._build_image_legacy()
+
+    def _build_image_legacy(self):
+        """Classic docker-py build without BuildKit features"""
         dockerfile_content = f"""
 FROM python:3.12-slim
 
@@ -48,27 +132,33 @@ RUN if [ -f pyproject.toml ]; then pip install --no-cache-dir -e . || true; fi
 
 CMD ["/bin/bash"]
 """
-        
+
+        ctx = Path(tempfile.gettempdir()) / "sudodev-ctx" / self.repo_name
+        ctx.mkdir(parents=True, exist_ok=True)
+        (ctx / "Dockerfile").write_text(dockerfile_content)
+
         # Build image
         try:
             logger.info("Starting Docker image build (this may take a few minutes)...")
             image, build_logs = self.client.images.build(
-                fileobj=io.BytesIO(dockerfile_content.encode()),
+                path=str(ctx),
                 tag=self.image_name,
                 rm=True
             )
             
-            # Process build logs
+            # Drain build logs but only format/emit the interesting lines;
+            # running every pip-install chunk through the logger serializes
+            # the build on formatter + handler I/O
             if build_logs:
                 for log_line in build_logs:
                     if isinstance(log_line, dict):
                         if 'stream' in log_line:
                             msg = log_line['stream'].strip()
-                            if msg:
+                            if msg and _BUILD_LOG_RE.search(msg):
                                 logger.info(msg)
                         elif 'error' in log_line:
                             logger.error(log_line['error'].strip())
-                    elif isinstance(log_line, str):
+                    elif isinstance(log_line, str) and _BUILD_LOG_RE.search(log_line):
                         logger.info(log_line.strip())
             
             logger.info(f"Successfully built image: {self.image_name}")
@@ -101,20 +191,42 @@ CMD ["/bin/bash"]
                 user="root"
             )
             logger.info(f"Container started (ID: {self.container.short_id})")
-            time.sleep(2)
+            self._wait_ready()
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to start container: {e}")
             return False
+
+    def _wait_ready(self, timeout: float = 5.0):
+        """Poll until the container accepts execs instead of sleeping a
+        fixed 2s"""
+        deadline = time.time() + timeout
+        delay = 0.05
+        while time.time() < deadline:
+            try:
+                self.container.reload()
+                if self.container.status == "running":
+                    if self.container.exec_run(["/bin/true"]).exit_code == 0:
+                        return
+            except Exception:
+                pass
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+        logger.warning("Container readiness probe timed out; continuing anyway")
     
-    def run_command(self, cmd: str, timeout: int = 60):
+    def run_command(self, cmd: str, timeout: int = 60, capture_output: bool = True):
         """Run command in container"""
         if not self.container:
             raise RuntimeError("Container is not running.")
-        
+
+        if not capture_output:
+            # discard inside the container; skips shipping and decoding
+            # output that the caller only wants the exit code from
+            cmd = f"({cmd}) >/dev/null 2>&1"
+
         wrapped_cmd = f"/bin/bash -c '{cmd}'"
-        
+
         try:
             exec_result = self.container.exec_run(
                 wrapped_cmd,
@@ -126,35 +238,67 @@ CMD ["/bin/bash"]
             logger.error(f"Command execution failed: {e}")
             return -1, str(e)
     
+    def run_python_script(self, script_path: str, timeout: int = 60):
+        """Run a Python script in the container.
+
+        Matches the Sandbox interface so the agent's reproduce/verify
+        steps work when this sandbox is swapped in for github mode; each
+        run is a plain exec, which also guarantees a fresh interpreter
+        (no cached modules) between reproduce and verify.
+        """
+        return self.run_command(f"python {script_path}", timeout=timeout)
+
     def write_file(self, filepath: str, content: str):
         """Write file to container"""
+        self.write_files({filepath: content})
+        logger.info(f"Wrote file: {filepath}")
+
+    def write_files(self, files: dict):
+        """Write several files in one archive and one docker round-trip"""
         tar_stream = io.BytesIO()
-        with tarfile.open(fileobj=tar_stream, mode='w') as tar:
-            data = content.encode('utf-8')
-            info = tarfile.TarInfo(name=filepath)
-            info.size = len(data)
-            tar.addfile(info, io.BytesIO(data))
-        
+        with tarfile.open(fileobj=tar_stream, mode='w', copybufsize=_TAR_BUFSIZE) as tar:
+            for filepath, content in files.items():
+                data = content.encode('utf-8')
+                info = tarfile.TarInfo(name=filepath)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
         tar_stream.seek(0)
         self.container.put_archive(path="/testbed", data=tar_stream)
-        logger.info(f"Wrote file: {filepath}")
     
-    def read_file(self, filepath: str) -> str:
+    def file_size(self, filepath: str):
+        """Get file size in bytes without transferring the file"""
+        if not filepath.startswith("/"):
+            filepath = f"/testbed/{filepath}"
+
+        exit_code, output = self.run_command(f"stat -c %s {filepath}")
+        if exit_code == 0:
+            try:
+                return int(output.strip())
+            except ValueError:
+                pass
+        return None
+
+    def read_file(self, filepath: str, max_bytes: int = None) -> str:
         """Read file from container"""
         if not filepath.startswith("/"):
             filepath = f"/testbed/{filepath}"
-        
+
+        if max_bytes is not None:
+            exit_code, output = self.run_command(f"head -c {max_bytes} {filepath}")
+            return output if exit_code == 0 else None
+
         try:
             bits, _ = self.container.get_archive(filepath)
-            file_obj = io.BytesIO()
-            for chunk in bits:
-                file_obj.write(chunk)
-            file_obj.seek(0)
-            
-            with tarfile.open(fileobj=file_obj) as tar:
-                member = tar.next()
-                f = tar.extractfile(member)
-                return f.read().decode('utf-8')
+            # stream-parse the archive as chunks arrive rather than
+            # buffering the whole thing in a BytesIO first
+            reader = io.BufferedReader(_ChunkReader(bits), buffer_size=1 << 20)
+            with tarfile.open(fileobj=reader, mode='r|', copybufsize=_TAR_BUFSIZE) as tar:
+                for member in tar:
+                    f = tar.extractfile(member)
+                    if f is not None:
+                        return f.read().decode('utf-8')
+            return None
         except Exception as e:
             logger.warning(f"Read file failed for {filepath}: {e}")
             return None
@@ -1,20 +1,60 @@
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+import asyncio
+import bisect
+import gzip
+import json
 import uuid
 import logging
+import multiprocessing
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from datasets import load_dataset
+from datasets import load_dataset, load_from_disk
+import pyarrow.compute as pc
 
-from sudodev.server.models import AgentRunRequest, AgentRunResponse, AgentStatusResponse
+from sudodev.server.models import (
+    AgentRunRequest,
+    AgentRunResponse,
+    AgentStatusResponse,
+    parse_agent_run_request,
+)
 from sudodev.core.cache_manager import InstanceCacheManager
 from sudodev.core.unified_agent import UnifiedAgent
 
-# Load SWE-bench dataset at startup (cached for fast lookups)
+# Load SWE-bench dataset at startup (cached for fast lookups).
+# SWE_BENCH_ARROW can point at a local copy made once with
+# load_dataset(...).save_to_disk(path): that mmaps the Arrow file with
+# no hub probe or checksum pass, and N uvicorn workers share the pages
+# instead of each rebuilding the cache.
 print("Loading SWE-bench dataset...")
-swe_bench_dataset = load_dataset("princeton-nlp/SWE-bench_Lite", split="test")
+_arrow_path = os.getenv("SWE_BENCH_ARROW")
+if _arrow_path:
+    os.environ.setdefault("HF_DATASETS_OFFLINE", "1")
+    swe_bench_dataset = load_from_disk(_arrow_path)
+else:
+    swe_bench_dataset = load_dataset("princeton-nlp/SWE-bench_Lite", split="test")
 print(f"Loaded {len(swe_bench_dataset)} issues from SWE-bench")
 
+# sorted view over the Arrow-backed instance_id column: the mmap'd
+# table is shared with forked agent workers for free, the two small
+# index lists replace a per-process hash map, and a lookup is a binary
+# search plus materializing exactly one row
+_ID_COLUMN = swe_bench_dataset.data.column("instance_id")
+_SORT_INDICES = pc.sort_indices(_ID_COLUMN)
+SORTED_IDS = _ID_COLUMN.take(_SORT_INDICES).to_pylist()
+SORTED_ROWS = _SORT_INDICES.to_pylist()
+
+def lookup_instance(instance_id: str):
+    i = bisect.bisect_left(SORTED_IDS, instance_id)
+    if i < len(SORTED_IDS) and SORTED_IDS[i] == instance_id:
+        return swe_bench_dataset[SORTED_ROWS[i]]
+    return None
+
 if os.path.exists("/app"):
     cache_dir = os.getenv("SWEBENCH_CACHE_DIR", "/app/cache/swebench")
 else:
@@ -33,14 +73,100 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-agent_runs = {}
+class RunStore:
+    """Bounded store for run state, shared between the background agent
+    threads that write logs and the request handlers that read them.
+    Logs are capped deques so a chatty run cannot grow without bound,
+    and the oldest runs are evicted once max_runs is reached."""
+
+    def __init__(self, max_runs: int = 500, max_logs: int = 10_000):
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_runs = max_runs
+        self.max_logs = max_logs
+
+    def create(self, run_id: str, data: dict):
+        data["logs"] = deque(data.get("logs", ()), maxlen=self.max_logs)
+        with self._lock:
+            self._runs[run_id] = data
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+
+    def get(self, run_id: str):
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def items(self):
+        # snapshot so handlers can iterate without holding the lock
+        with self._lock:
+            return list(self._runs.items())
+
+    def __contains__(self, run_id: str) -> bool:
+        with self._lock:
+            return run_id in self._runs
+
+    def __getitem__(self, run_id: str):
+        run = self.get(run_id)
+        if run is None:
+            raise KeyError(run_id)
+        return run
+
+agent_runs = RunStore()
+
+def _now_iso() -> str:
+    """Second-resolution timestamp; skips microsecond formatting cost"""
+    return datetime.now().isoformat(timespec='seconds')
 
 def add_log(run_id: str, message: str, step: int = None):
     """Add a log message to the agent run"""
-    if run_id in agent_runs:
-        agent_runs[run_id]["logs"].append(message)
+    run = agent_runs.get(run_id)
+    if run is not None:
+        run["logs"].append(message)
+        # monotonic counter so stream/since readers can tell how many
+        # lines exist even after the capped deque starts evicting
+        run["log_count"] = run.get("log_count", 0) + 1
         if step is not None:
-            agent_runs[run_id]["current_step"] = step
+            run["current_step"] = step
+
+# agents run in worker processes so a CPU/IO-heavy run never starves
+# the request handlers; log lines and state updates flow back to the
+# parent through this queue (inherited by the forked workers) and are
+# applied to agent_runs by a drain thread
+EXECUTOR = ProcessPoolExecutor(max_workers=os.cpu_count())
+_EVENT_QUEUE = multiprocessing.Queue()
+
+# back-pressure: once this many runs are queued or running, /api/run
+# returns 429 so clients back off instead of stacking work indefinitely
+_MAX_PENDING_RUNS = int(os.getenv("AGENT_MAX_PENDING", str((os.cpu_count() or 2) * 2)))
+_PENDING_RUNS = threading.BoundedSemaphore(_MAX_PENDING_RUNS)
+
+def _publish(run_id: str, updates: dict = None, log: str = None, step: int = None):
+    """Send a run-state update from a worker process to the parent"""
+    _EVENT_QUEUE.put((run_id, updates, log, step))
+
+def _drain_events():
+    while True:
+        run_id, updates, log, step = _EVENT_QUEUE.get()
+        run = agent_runs.get(run_id)
+        if run is None:
+            continue
+        if updates:
+            run.update(updates)
+        if log is not None:
+            add_log(run_id, log, step)
+        elif step is not None:
+            run["current_step"] = step
+        # wake any stream handler blocked on this run
+        event = run.get("event")
+        if event is not None:
+            event.set()
+
+threading.Thread(target=_drain_events, daemon=True).start()
+
+# third-party libraries log aggressively during builds/downloads; keep
+# them out of the capture path (and the per-run log buffers) entirely
+logging.getLogger("urllib3").setLevel(logging.WARNING)
+logging.getLogger("docker").setLevel(logging.WARNING)
 
 class LogCaptureHandler(logging.Handler):
     """Custom logging handler to capture agent logs"""
@@ -50,64 +176,78 @@ class LogCaptureHandler(logging.Handler):
         self.setLevel(logging.INFO)
         formatter = logging.Formatter('%(message)s')
         self.setFormatter(formatter)
-        
+
     def emit(self, record):
+        # the handler sits on the root logger; drop foreign records
+        # before paying for formatting
+        if not record.name.startswith("sudodev"):
+            return
         try:
             msg = self.format(record)
             if msg.strip():
-                add_log(self.run_id, msg)
+                _publish(self.run_id, log=msg)
         except Exception:
             pass
 
-def run_agent(run_id: str, request: AgentRunRequest):
-    """Execute the real SudoDev agent"""
+def run_agent(run_id: str, request_data: dict):
+    """Execute the real SudoDev agent (runs in a worker process)"""
     import time
     from sudodev.core.improved_agent import ImprovedAgent
     from sudodev.core.utils.logger import setup_logger
-    
-    agent_runs[run_id]["status"] = "running"
-    agent_runs[run_id]["message"] = "Preparing instance..."
-    
+
+    request = parse_agent_run_request(request_data)
+
+    _publish(run_id, {"status": "running", "message": "Preparing instance..."})
+
     log_handler = LogCaptureHandler(run_id)
     root_logger = logging.getLogger()
     root_logger.addHandler(log_handler)
-    
+
     try:
         if request.mode == "swebench":
-            add_log(run_id, f"[INIT] Loading issue {request.instance_id}...", 0)
-            issue = next((item for item in swe_bench_dataset if item["instance_id"] == request.instance_id), None)
+            _publish(run_id, log=f"[INIT] Loading issue {request.instance_id}...", step=0)
+            issue = lookup_instance(request.instance_id)
 
             if not issue:
                 raise FileNotFoundError(f"Instance {request.instance_id} not found in SWE-bench dataset")
             
-            add_log(run_id, f"[CACHE] Checking cache for {request.instance_id}...", 0)
+            _publish(run_id, log=f"[CACHE] Checking cache for {request.instance_id}...", step=0)
             if not cache_manager.is_instance_cached(request.instance_id):
-                add_log(run_id, f"[CACHE] Instance not cached, downloading from SWE-bench...", 0)
-                agent_runs[run_id]["message"] = "Downloading instance environment..."
+                _publish(run_id, log=f"[CACHE] Instance not cached, downloading from SWE-bench...", step=0)
+                _publish(run_id, {"message": "Downloading instance environment..."})
                 
                 if not cache_manager.download_instance(request.instance_id):
                     raise Exception(f"Failed to download instance {request.instance_id}")
                 
-                add_log(run_id, f"[CACHE] Instance cached successfully ✓", 0)
+                _publish(run_id, log=f"[CACHE] Instance cached successfully ✓", step=0)
             else:
-                add_log(run_id, f"[CACHE] Using cached instance ✓", 0)
+                _publish(run_id, log=f"[CACHE] Using cached instance ✓", step=0)
 
             agent = UnifiedAgent(mode="swebench", issue_data=issue)
 
         elif request.mode == "github":
-            add_log(run_id, f"[INIT] Processing GitHub repository...", 0)
-            add_log(run_id, f"[REPO] URL: {request.github_url}", 0)
-            add_log(run_id, f"[REPO] Branch: {request.branch}", 0)
+            _publish(run_id, log=f"[INIT] Processing GitHub repository...", step=0)
+            _publish(run_id, log=f"[REPO] URL: {request.github_url}", step=0)
+            _publish(run_id, log=f"[REPO] Branch: {request.branch}", step=0)
 
             if request.issue_url:
-                add_log(run_id, f"[ISSUE] Fetched from GitHub: {request.issue_url}", 0)
+                _publish(run_id, log=f"[ISSUE] Fetching from GitHub: {request.issue_url}", step=0)
             elif request.issue_number:
-                add_log(run_id, f"[ISSUE] Using GitHub issue #{request.issue_number}", 0)
+                _publish(run_id, log=f"[ISSUE] Fetching GitHub issue #{request.issue_number}", step=0)
             else:
-                add_log(run_id, f"[ISSUE] Using manual description", 0)
+                _publish(run_id, log=f"[ISSUE] Using manual description", step=0)
+
+            # deferred from the request validator so POST /api/run
+            # returns immediately; a fetch failure fails the run through
+            # the ValueError handler below
+            if not request.issue_description:
+                _publish(run_id, {"message": "Fetching issue from GitHub..."})
+                request.github_fetch_if_needed()
+                _publish(run_id, log=f"[ISSUE] Issue fetched ✓", step=0)
+                _publish(run_id, {"problem_statement": request.issue_description})
             
-            add_log(run_id, f"[BUILD] Building Docker image (this may take a few minutes)...", 0)
-            agent_runs[run_id]["message"] = "Cloning repository and building environment..."
+            _publish(run_id, log=f"[BUILD] Building Docker image (this may take a few minutes)...", step=0)
+            _publish(run_id, {"message": "Cloning repository and building environment..."})
             
             repo_name = request.github_url.split('/')[-1].replace('.git', '')
             
@@ -119,47 +259,44 @@ def run_agent(run_id: str, request: AgentRunRequest):
                 repo_name=repo_name
             )
             
-            add_log(run_id, f"[BUILD] Docker image built successfully ✓", 0)
+            _publish(run_id, log=f"[BUILD] Docker image built successfully ✓", step=0)
 
         else:
             raise ValueError(f"Unknown mode: {request.mode}")
         
-        add_log(run_id, f"[AGENT] Starting analysis...", 1)
-        agent_runs[run_id]["message"] = "Agent is analyzing the issue..."
+        _publish(run_id, log=f"[AGENT] Starting analysis...", step=1)
+        _publish(run_id, {"message": "Agent is analyzing the issue..."})
         
         success = agent.run()
 
         patch = ""
         if success:
             patch = agent.get_patch()
-        agent_runs[run_id]["patch"] = patch
+        # store once as gzip (fast level); the status poller never carries
+        # the patch, so a multi-KB diff is not re-serialized every second
+        _publish(run_id, {"patch_gz": gzip.compress(patch.encode(), compresslevel=1)})
         
         if success:
-            add_log(run_id, "[COMPLETE] Fix generated successfully ✓", 5)
-            agent_runs[run_id]["status"] = "completed"
-            agent_runs[run_id]["message"] = "Fix generated successfully"
+            _publish(run_id, log="[COMPLETE] Fix generated successfully ✓", step=5)
+            _publish(run_id, {"status": "completed", "message": "Fix generated successfully"})
         else:
-            add_log(run_id, "[ERROR] Agent could not generate a fix")
-            agent_runs[run_id]["status"] = "failed"
-            agent_runs[run_id]["message"] = "Agent could not resolve the issue"
+            _publish(run_id, log="[ERROR] Agent could not generate a fix")
+            _publish(run_id, {"status": "failed", "message": "Agent could not resolve the issue"})
             
     except FileNotFoundError as e:
         error_msg = f"Instance not found: {str(e)}"
-        add_log(run_id, f"[ERROR] {error_msg}")
-        agent_runs[run_id]["status"] = "failed"
-        agent_runs[run_id]["message"] = error_msg
+        _publish(run_id, log=f"[ERROR] {error_msg}")
+        _publish(run_id, {"status": "failed", "message": error_msg})
 
     except ValueError as e:
         error_msg = str(e)
-        add_log(run_id, f"[ERROR] {error_msg}")
-        agent_runs[run_id]["status"] = "failed"
-        agent_runs[run_id]["message"] = f"Validation error: {error_msg}"
+        _publish(run_id, log=f"[ERROR] {error_msg}")
+        _publish(run_id, {"status": "failed", "message": f"Validation error: {error_msg}"})
 
     except Exception as e:
         error_msg = str(e)
-        add_log(run_id, f"[ERROR] {error_msg}")
-        agent_runs[run_id]["status"] = "failed"
-        agent_runs[run_id]["message"] = f"Error: {error_msg}"
+        _publish(run_id, log=f"[ERROR] {error_msg}")
+        _publish(run_id, {"status": "failed", "message": f"Error: {error_msg}"})
         
         import traceback
         traceback.print_exc()
@@ -177,23 +314,38 @@ def root():
     }
 
 @app.post("/api/run")
-def start_run(request: AgentRunRequest, background_tasks: BackgroundTasks):
+def start_run(request: AgentRunRequest):
+    if not _PENDING_RUNS.acquire(blocking=False):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many agent runs in flight; retry later"
+        )
+
     run_id = str(uuid.uuid4())
-    
-    agent_runs[run_id] = {
+
+    agent_runs.create(run_id, {
         "status": "pending",
         "mode": request.mode,
-        "instance_id": request.instance_id if request.mode == "swebench" else None,
-        "github_url": request.github_url if request.mode == "github" else None,
-        "problem_statement": request.problem_statement or request.issue_description,
-        "created_at": datetime.now().isoformat(),
+        "instance_id": getattr(request, "instance_id", None),
+        "github_url": getattr(request, "github_url", None),
+        "problem_statement": getattr(request, "problem_statement", None)
+            or getattr(request, "issue_description", None),
+        "created_at": _now_iso(),
+        # monotonic start so elapsed time is a subtraction, not an
+        # ISO-string parse
+        "created_monotonic": time.monotonic(),
         "logs": [],
         "current_step": 0,
-        "patch": "",
+        "log_count": 0,
+        "patch_gz": None,
+        # set by the drain thread on every state change; SSE handlers
+        # block on it instead of polling on a timer
+        "event": threading.Event(),
         "message": "Initializing..."
-    }
-    
-    background_tasks.add_task(run_agent, run_id, request)
+    })
+
+    future = EXECUTOR.submit(run_agent, run_id, request.model_dump())
+    future.add_done_callback(lambda f: _PENDING_RUNS.release())
     
     return AgentRunResponse(
         run_id=run_id,
@@ -202,20 +354,91 @@ def start_run(request: AgentRunRequest, background_tasks: BackgroundTasks):
     )
 
 @app.get("/api/status/{run_id}")
-def get_status(run_id: str):
-    if run_id not in agent_runs:
+def get_status(run_id: str, since: int = 0):
+    run = agent_runs.get(run_id)
+    if run is None:
         return {"error": "Run not found"}
-    
-    run = agent_runs[run_id]
+
+    # with ?since=<count> a poller only gets lines it has not seen,
+    # instead of re-serializing the whole history every second
+    logs = list(run.get("logs", ()))
+    if since > 0:
+        count = run.get("log_count", len(logs))
+        logs = logs[-(count - since):] if count > since else []
+
     return AgentStatusResponse(
         run_id=run_id,
         status=run["status"],
         message=run.get("message"),
-        logs=run.get("logs", []),
-        current_step=run.get("current_step", 0),
-        patch=run.get("patch", "")
+        logs=logs,
+        current_step=run.get("current_step", 0)
+    )
+
+@app.get("/api/runs/{run_id}/patch")
+def get_patch(run_id: str):
+    run = agent_runs.get(run_id)
+    if run is None:
+        return {"error": "Run not found"}
+
+    patch_gz = run.get("patch_gz")
+    if not patch_gz:
+        return Response(status_code=204)
+
+    # ship the stored gzip bytes as-is; clients that honour
+    # Content-Encoding decompress transparently, so the server never
+    # decompresses either
+    return Response(
+        content=patch_gz,
+        media_type="text/plain",
+        headers={"Content-Encoding": "gzip"}
     )
 
+@app.get("/api/status/{run_id}/stream")
+async def stream_status(run_id: str):
+    """Push log lines as server-sent events instead of making clients
+    poll ever-growing arrays"""
+    if run_id not in agent_runs:
+        return {"error": "Run not found"}
+
+    async def event_stream():
+        cursor = 0
+        while True:
+            run = agent_runs.get(run_id)
+            if run is None:
+                break
+
+            event = run.get("event")
+            if event is not None:
+                # clear before reading state: anything published after
+                # this point re-sets the event, so no update is missed
+                event.clear()
+
+            count = run.get("log_count", 0)
+            if count > cursor:
+                logs = list(run["logs"])
+                for line in logs[-(count - cursor):]:
+                    yield f"data: {json.dumps(line)}\n\n"
+                cursor = count
+
+            if run["status"] in ("completed", "failed"):
+                payload = {"status": run["status"], "message": run.get("message")}
+                started = run.get("created_monotonic")
+                if started is not None:
+                    payload["elapsed_s"] = round(time.monotonic() - started, 1)
+                yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+                break
+
+            if event is not None:
+                # held open until the next state change; the timeout only
+                # produces a keepalive comment so proxies keep the
+                # connection alive
+                if not await asyncio.to_thread(event.wait, 30.0):
+                    yield ": keepalive\n\n"
+            else:
+                await asyncio.sleep(0.5)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/api/runs")
 def list_runs():
     return {
@@ -226,7 +449,7 @@ def list_runs():
                 "status": run["status"],
                 "created_at": run["created_at"]
             }
-            for run_id, run in agent_runs.items()
+            for run_id, run in agent_runs.items()  # snapshot copy
         ]
     }
 
@@ -1,67 +1,257 @@
-from pydantic import BaseModel, Field, model_validator
-from typing import Optional, List, Literal
+from pydantic import BaseModel, Field, TypeAdapter, model_validator
+from typing import Annotated, Optional, List, Literal, Union
+import os
 import requests
 import re
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter, Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _parse_json(response):
+    """Decode a response body with orjson when available (~3x faster on
+    issue-sized payloads than the stdlib parser)"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+_GH_HEADERS = {
+    'Accept': 'application/vnd.github.v3+json',
+    'User-Agent': 'SudoDev-Agent'
+}
+
+# authenticated requests get the 5000/hr rate limit instead of 60/hr per
+# IP; GITHUB_TOKEN_POOL (comma-separated) round-robins several tokens so
+# each gets its own 5k bucket
+_GH_TOKEN = os.getenv('GITHUB_TOKEN')
+_TOKEN_POOL = [t.strip() for t in os.getenv('GITHUB_TOKEN_POOL', '').split(',') if t.strip()]
+_TOKEN_CYCLE = itertools.cycle(_TOKEN_POOL) if _TOKEN_POOL else None
+_TOKEN_LOCK = threading.Lock()
+
+if _GH_TOKEN and not _TOKEN_POOL:
+    _GH_HEADERS['Authorization'] = f"Bearer {_GH_TOKEN}"
+
+
+def _auth_headers() -> dict:
+    """Per-request Authorization when rotating a token pool; a single
+    token lives in the client's default headers instead"""
+    if _TOKEN_CYCLE is None:
+        return {}
+    with _TOKEN_LOCK:
+        return {'Authorization': f"Bearer {next(_TOKEN_CYCLE)}"}
+
+# one client per process: GitHub calls reuse a pooled keep-alive socket
+# instead of paying a fresh TLS handshake per GET. With httpx and the h2
+# extra installed, HTTP/2 multiplexes the issue + comments pair on a
+# single stream with HPACK header compression; otherwise fall back to
+# httpx over HTTP/1.1 and finally to a requests Session with retries.
+if httpx is not None:
+    _LIMITS = httpx.Limits(max_keepalive_connections=8, max_connections=16)
+    try:
+        _GH_CLIENT = httpx.Client(http2=True, timeout=10.0,
+                                  headers=_GH_HEADERS, limits=_LIMITS)
+    except ImportError:
+        _GH_CLIENT = httpx.Client(timeout=10.0, headers=_GH_HEADERS, limits=_LIMITS)
+    _TIMEOUT_ERRORS = (httpx.TimeoutException,)
+    _FETCH_ERRORS = (httpx.HTTPError,)
+else:
+    _GH_CLIENT = requests.Session()
+    _GH_CLIENT.headers.update(_GH_HEADERS)
+    _GH_CLIENT.mount('https://', HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+    ))
+    _TIMEOUT_ERRORS = (requests.exceptions.Timeout,)
+    _FETCH_ERRORS = (requests.exceptions.RequestException,)
+
+# the comments URL is deterministic (issue URL + '/comments'), so both
+# GETs can be in flight at once instead of paying two serial round-trips
+_FETCH_POOL = ThreadPoolExecutor(max_workers=4)
+
+# ETags from previous fetches, keyed (owner, repo, number) for the issue
+# and (owner, repo, number, 'comments') for its comments. A 304 reply
+# costs no rate-limit budget and skips the JSON body entirely, so
+# re-validating an unchanged issue is nearly free.
+_ISSUE_ETAG_CACHE: dict = {}
+_ETAG_LOCK = threading.Lock()
+
+# short-TTL front cache keyed on the normalized issue URL: re-submitting
+# the same issue within the window skips HTTP entirely (the ETag cache
+# above still saves the JSON body once the TTL lapses)
+_ISSUE_TTL_CACHE: dict = {}
+_ISSUE_TTL_SECONDS = 120
+_ISSUE_TTL_MAXSIZE = 512
+_TTL_LOCK = threading.Lock()
+
+# compiled once; validation hits this on every github-mode request
+_ISSUE_URL_RE = re.compile(r'^https://github\.com/([^/]+)/([^/]+)/issues/(\d+)$')
+
+_GRAPHQL_URL = "https://api.github.com/graphql"
+
+
+def _format_graphql_issue(node: dict) -> str:
+    """Render a GraphQL issue node into the same text _format_issue
+    produces from the REST payload"""
+    labels = [l['name'] for l in node.get('labels', {}).get('nodes', [])]
+    parts = [f"""# GitHub Issue: {node.get('title', 'Untitled Issue')}
+
+**Issue URL**: {node.get('url', '')}
+**Status**: {node.get('state', 'open').lower()}
+**Labels**: {', '.join(labels) if labels else 'None'}
+
+## Issue Description
 
+{node.get('body') or 'No description provided.'}
+"""]
+
+    comments = node.get('comments', {})
+    nodes = comments.get('nodes', [])
+    if nodes:
+        parts.append("\n\n## Recent Comments\n")
+        for i, comment in enumerate(nodes[:3], 1):
+            author = (comment.get('author') or {}).get('login', 'ghost')
+            parts.append(f"\n**Comment {i}** by @{author}:\n{comment.get('body', '')[:500]}\n")
+        total = comments.get('totalCount', len(nodes))
+        if total > 3:
+            parts.append(f"\n... and {total - 3} more comments (see issue URL)\n")
+
+    return "".join(parts).strip()
+
+
+def _fetch_github_issues_batch(refs: list) -> dict:
+    """Fetch several (owner, repo, number) issues in one aliased GraphQL
+    query — one rate-limit point for the whole batch instead of one REST
+    round-trip each. Returns {ref: formatted}; refs that could not be
+    resolved (or the whole batch, when no token is configured — GraphQL
+    rejects anonymous queries) are simply absent, so callers fall back
+    to the per-issue REST path for them."""
+    auth = _auth_headers()
+    if not auth and 'Authorization' not in _GH_HEADERS:
+        return {}
+
+    refs = list(refs)[:20]
+    fields = []
+    for i, (owner, repo, number) in enumerate(refs):
+        fields.append(
+            f'i{i}: repository(owner: "{owner}", name: "{repo}") {{'
+            f' issue(number: {int(number)}) {{ title body state url'
+            f' labels(first: 10) {{ nodes {{ name }} }}'
+            f' comments(first: 3) {{ totalCount nodes {{ author {{ login }} body }} }}'
+            f' }} }}'
+        )
+    query = "query { " + " ".join(fields) + " }"
+
+    try:
+        response = _GH_CLIENT.post(
+            _GRAPHQL_URL, json={'query': query}, headers=auth, timeout=10
+        )
+        response.raise_for_status()
+        data = _parse_json(response).get('data') or {}
+    except Exception:
+        return {}
+
+    results = {}
+    for i, ref in enumerate(refs):
+        repository = data.get(f'i{i}') or {}
+        node = repository.get('issue')
+        if node:
+            results[ref] = _format_graphql_issue(node)
+    return results
+
+
+class SWEBenchRunRequest(BaseModel):
+    mode: Literal["swebench"] = "swebench"
+
+    instance_id: str
+    problem_statement: Optional[str] = None
 
-class AgentRunRequest(BaseModel):
-    mode: Literal["swebench", "github"] = Field(default="swebench")
 
-    instance_id: Optional[str] = None
+class GitHubRunRequest(BaseModel):
+    mode: Literal["github"] = "github"
 
-    github_url: Optional[str] = None
+    github_url: str
     branch: Optional[str] = "main"
 
     issue_description: Optional[str] = None
     issue_url: Optional[str] = None
     issue_number: Optional[int] = None
 
-    problem_statement: Optional[str] = None
-
     @model_validator(mode='after')
-    def validate_and_fetch_issue(self):
-        if self.mode == "swebench":
-            if not self.instance_id:
-                raise ValueError("instance_id is required for swebench mode")
-
-        elif self.mode == "github":
-            if not self.github_url:
-                raise ValueError("github_url is required for github mode")
-
-            if self.issue_url:
-                try:
-                    self.issue_description = self._fetch_github_issue(self.issue_url)
-                except Exception:
-                    raise
-
-            elif self.issue_number:
-                if not self.github_url:
-                    raise ValueError("github_url required when using issue_number")
-
-                issue_url = self._construct_issue_url(self.github_url, self.issue_number)
-                try:
-                    self.issue_description = self._fetch_github_issue(issue_url)
-                except Exception:
-                    raise
-
-            elif not self.issue_description:
+    def validate_issue_source(self):
+        # shape checks only — the actual GitHub fetch happens in the
+        # worker via github_fetch_if_needed(), so POST /api/run responds
+        # without waiting on up to two 10s API round-trips
+        if self.issue_url:
+            if not _ISSUE_URL_RE.match(self.issue_url.rstrip('/')):
                 raise ValueError(
-                    "Must provide one of: issue_description, issue_url, or issue_number"
+                    f"Invalid GitHub issue URL: {self.issue_url}\n"
+                    f"Expected format: https://github.com/owner/repo/issues/123"
                 )
 
+        elif not self.issue_number and not self.issue_description:
+            raise ValueError(
+                "Must provide one of: issue_description, issue_url, or issue_number"
+            )
+
         return self
 
+    def github_fetch_if_needed(self) -> str:
+        """Resolve issue_url / issue_number into issue_description.
+        Called from the background run, not the validator; fetch errors
+        surface through the run's normal failure path."""
+        if self.issue_description:
+            return self.issue_description
+
+        if self.issue_url:
+            self.issue_description = self._fetch_github_issue(self.issue_url)
+        elif self.issue_number:
+            issue_url = self._construct_issue_url(self.github_url, self.issue_number)
+            self.issue_description = self._fetch_github_issue(issue_url)
+
+        return self.issue_description
+
     def _construct_issue_url(self, repo_url: str, issue_number: int) -> str:
-        clean_url = repo_url.rstrip('/').rstrip('.git')
+        # removesuffix, not rstrip('.git'): rstrip strips any trailing
+        # '.', 'g', 'i', 't' chars and mangles repo names ending in them
+        clean_url = repo_url.rstrip('/').removesuffix('.git')
         return f"{clean_url}/issues/{issue_number}"
 
     def _fetch_github_issue(self, issue_url: str) -> str:
+        key = issue_url.lower().rstrip('/')
+        now = time.monotonic()
+
+        with _TTL_LOCK:
+            hit = _ISSUE_TTL_CACHE.get(key)
+        if hit and now - hit[0] < _ISSUE_TTL_SECONDS:
+            return hit[1]
+
+        formatted = self._fetch_github_issue_uncached(issue_url)
+
+        with _TTL_LOCK:
+            if len(_ISSUE_TTL_CACHE) >= _ISSUE_TTL_MAXSIZE:
+                oldest = min(_ISSUE_TTL_CACHE, key=lambda k: _ISSUE_TTL_CACHE[k][0])
+                del _ISSUE_TTL_CACHE[oldest]
+            _ISSUE_TTL_CACHE[key] = (now, formatted)
+
+        return formatted
+
+    def _fetch_github_issue_uncached(self, issue_url: str) -> str:
         clean_url = issue_url.rstrip('/')
 
-        match = re.match(
-            r'https://github\.com/([^/]+)/([^/]+)/issues/(\d+)',
-            clean_url
-        )
+        match = _ISSUE_URL_RE.match(clean_url)
 
         if not match:
             raise ValueError(
@@ -71,17 +261,38 @@ class AgentRunRequest(BaseModel):
 
         owner, repo, issue_number = match.groups()
         api_url = f"https://api.github.com/repos/{owner}/{repo}/issues/{issue_number}"
+        cache_key = (owner, repo, issue_number)
+
+        headers = _auth_headers()
+        comments_headers = _auth_headers()
+        with _ETAG_LOCK:
+            cached = _ISSUE_ETAG_CACHE.get(cache_key)
+            comments_cached = _ISSUE_ETAG_CACHE.get(cache_key + ('comments',))
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        if comments_cached:
+            comments_headers['If-None-Match'] = comments_cached[0]
 
         try:
-            response = requests.get(
-                api_url,
-                headers={
-                    'Accept': 'application/vnd.github.v3+json',
-                    'User-Agent': 'SudoDev-Agent'
-                },
-                timeout=10
+            # dispatch both GETs at once; the comments request is only
+            # consumed if the issue actually has comments
+            f_issue = _FETCH_POOL.submit(
+                _GH_CLIENT.get, api_url, headers=headers, timeout=10
+            )
+            # per_page=3 matches the display cap, so GitHub serializes
+            # three comment objects instead of a 30-comment first page
+            f_comments = _FETCH_POOL.submit(
+                _GH_CLIENT.get, f"{api_url}/comments?per_page=3",
+                headers=comments_headers, timeout=10
             )
 
+            response = f_issue.result()
+
+            # gate 304 before any status/body handling: there is no body
+            # to parse and nothing to raise on
+            if cached and response.status_code == 304:
+                return cached[1]
+
             if response.status_code == 404:
                 raise ValueError(
                     f"Issue not found: {issue_url}\n"
@@ -89,16 +300,31 @@ class AgentRunRequest(BaseModel):
                 )
 
             response.raise_for_status()
-            issue_data = response.json()
-            return self._format_issue(issue_data)
+            issue_data = _parse_json(response)
+
+            if issue_data.get('comments', 0) > 0:
+                formatted = self._format_issue(
+                    issue_data, cache_key=cache_key, comments_future=f_comments
+                )
+            else:
+                f_comments.cancel()
+                formatted = self._format_issue(issue_data, cache_key=cache_key)
+
+            etag = response.headers.get('ETag')
+            if etag:
+                with _ETAG_LOCK:
+                    _ISSUE_ETAG_CACHE[cache_key] = (etag, formatted)
+
+            return formatted
 
-        except requests.exceptions.Timeout:
+        except _TIMEOUT_ERRORS:
             raise ValueError("GitHub API request timed out. Please try again.")
 
-        except requests.exceptions.RequestException as e:
+        except _FETCH_ERRORS as e:
             raise ValueError(f"Failed to fetch GitHub issue: {str(e)}")
 
-    def _format_issue(self, issue_data: dict) -> str:
+    def _format_issue(self, issue_data: dict, cache_key: tuple = None,
+                      comments_future=None) -> str:
         title = issue_data.get('title', 'Untitled Issue')
         body = issue_data.get('body', 'No description provided.')
         state = issue_data.get('state', 'open')
@@ -118,29 +344,56 @@ class AgentRunRequest(BaseModel):
 
         comments_url = issue_data.get('comments_url')
         if comments_url and issue_data.get('comments', 0) > 0:
-            try:
-                comments_response = requests.get(
-                    comments_url,
-                    headers={
-                        'Accept': 'application/vnd.github.v3+json',
-                        'User-Agent': 'SudoDev-Agent'
-                    },
-                    timeout=10
-                )
+            comments_key = cache_key + ('comments',) if cache_key else None
+            headers = _auth_headers()
+            cached = None
+            if comments_key:
+                with _ETAG_LOCK:
+                    cached = _ISSUE_ETAG_CACHE.get(comments_key)
+                if cached:
+                    headers['If-None-Match'] = cached[0]
 
-                if comments_response.status_code == 200:
-                    comments = comments_response.json()
+            try:
+                if comments_future is not None:
+                    # already in flight since before the issue body landed
+                    comments_response = comments_future.result()
+                else:
+                    comments_response = _GH_CLIENT.get(
+                        f"{comments_url}?per_page=3",
+                        headers=headers,
+                        timeout=10
+                    )
+
+                if cached and comments_response.status_code == 304:
+                    formatted += cached[1]
+
+                elif comments_response.status_code == 200:
+                    comments = _parse_json(comments_response)
+                    # collect pieces and join once instead of repeated
+                    # str += copies
+                    parts = []
 
                     if comments:
-                        formatted += "\n\n## Recent Comments\n"
+                        parts.append("\n\n## Recent Comments\n")
 
                         for i, comment in enumerate(comments[:3], 1):
                             author = comment['user']['login']
                             comment_body = comment['body'][:500]
-                            formatted += f"\n**Comment {i}** by @{author}:\n{comment_body}\n"
+                            parts.append(f"\n**Comment {i}** by @{author}:\n{comment_body}\n")
+
+                        # the page holds at most 3 entries; the issue's own
+                        # comment count is the true total
+                        total = issue_data.get('comments', 0)
+                        if total > 3:
+                            parts.append(f"\n... and {total - 3} more comments (see issue URL)\n")
+
+                    section = "".join(parts)
+                    formatted += section
 
-                        if len(comments) > 3:
-                            formatted += f"\n... and {len(comments) - 3} more comments (see issue URL)\n"
+                    etag = comments_response.headers.get('ETag')
+                    if comments_key and etag:
+                        with _ETAG_LOCK:
+                            _ISSUE_ETAG_CACHE[comments_key] = (etag, section)
 
             except:
                 pass
@@ -148,6 +401,22 @@ class AgentRunRequest(BaseModel):
         return formatted.strip()
 
 
+# pydantic-core dispatches on the mode tag before running any Python-level
+# validation, so requests with missing per-mode fields fail fast and the
+# swebench path never touches the GitHub fetch logic
+AgentRunRequest = Annotated[
+    Union[SWEBenchRunRequest, GitHubRunRequest],
+    Field(discriminator="mode")
+]
+
+_request_adapter = TypeAdapter(AgentRunRequest)
+
+
+def parse_agent_run_request(data: dict):
+    """Validate a plain dict into the matching run-request model"""
+    return _request_adapter.validate_python(data)
+
+
 class AgentRunResponse(BaseModel):
     run_id: str
     status: str
@@ -160,4 +429,3 @@ class AgentStatusResponse(BaseModel):
     message: Optional[str] = None
     logs: Optional[List[str]] = []
     current_step: Optional[int] = 0
-    patch: Optional[str] = None
@@ -1,70 +1,154 @@
+import json
+import os
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, HTTPException
 from sudodev.server.models import (
     AgentRunRequest,
-    AgentRunResponse, 
-    AgentStatusResponse,
-    AgentStatus
+    AgentRunResponse,
+    AgentStatusResponse
 )
 from sudodev.core.improved_agent import ImprovedAgent
 
+try:
+    import redis
+except ImportError:
+    redis = None
+
 router = APIRouter()
 
-# Simple in-memory storage
-agent_runs: Dict[str, Dict] = {}
+
+def _now_iso() -> str:
+    """Second-resolution timestamp; skips microsecond formatting cost"""
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class _RunStore:
+    """Run state in Redis (run:{id} JSON blobs, 24h expiry) so any
+    uvicorn worker can serve status for a run another worker started and
+    state survives restarts. Falls back to a process-local dict — which
+    only works with a single worker — when redis is not installed or not
+    reachable."""
+
+    def __init__(self):
+        self._local: Dict[str, Dict] = {}
+        self._redis = None
+        if redis is not None:
+            try:
+                client = redis.Redis.from_url(
+                    os.getenv("REDIS_URL", "redis://localhost:6379/0")
+                )
+                client.ping()
+                self._redis = client
+            except Exception:
+                self._redis = None
+
+    def set(self, run_id: str, data: Dict):
+        if self._redis is not None:
+            self._redis.set(f"run:{run_id}", json.dumps(data), ex=86400)
+        else:
+            self._local[run_id] = data
+
+    def update(self, run_id: str, **fields):
+        run = self.get(run_id)
+        if run is not None:
+            run.update(fields)
+            self.set(run_id, run)
+
+    def get(self, run_id: str):
+        if self._redis is not None:
+            raw = self._redis.get(f"run:{run_id}")
+            return json.loads(raw) if raw is not None else None
+        return self._local.get(run_id)
+
+    def iter_runs(self, limit: int = 100):
+        if self._redis is not None:
+            for i, key in enumerate(self._redis.scan_iter("run:*", count=100)):
+                if i >= limit:
+                    break
+                raw = self._redis.get(key)
+                if raw is not None:
+                    yield json.loads(raw)
+        else:
+            for run in list(self._local.values())[:limit]:
+                yield run
+
+
+run_store = _RunStore()
+
+# Dedicated worker pool: a minutes-long agent run must not occupy the
+# threadpool uvicorn uses for request handling (BackgroundTasks runs
+# sync tasks on exactly that pool), so the 202 response frees the worker
+# immediately and concurrent requests are unaffected
+_AGENT_CONCURRENCY = int(os.getenv("AGENT_CONCURRENCY", "2"))
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=_AGENT_CONCURRENCY, thread_name_prefix="agent"
+)
+
+# back-pressure: once this many runs are queued or running, /run returns
+# 429 so clients back off instead of stacking work indefinitely
+_PENDING_RUNS = threading.BoundedSemaphore(_AGENT_CONCURRENCY * 4)
 
 
 def run_agent_task(run_id: str, issue_data: Dict):
-    """Background task to run the agent."""
+    """Worker-pool task to run the agent."""
     try:
-        agent_runs[run_id]["status"] = AgentStatus.RUNNING
-        agent_runs[run_id]["started_at"] = datetime.now().isoformat()
-        
+        run_store.update(run_id, status="running",
+                         started_at=_now_iso())
+
         # Run the agent
         agent = ImprovedAgent(issue_data)
         success = agent.run()
-        
+
         # Update status
         if success:
-            agent_runs[run_id]["status"] = AgentStatus.COMPLETED
-            agent_runs[run_id]["output"] = {"success": True}
+            run_store.update(run_id, status="completed",
+                             output={"success": True},
+                             completed_at=_now_iso())
         else:
-            agent_runs[run_id]["status"] = AgentStatus.FAILED
-            agent_runs[run_id]["error"] = "Agent failed to generate a fix"
-        
-        agent_runs[run_id]["completed_at"] = datetime.now().isoformat()
-            
+            run_store.update(run_id, status="failed",
+                             error="Agent failed to generate a fix",
+                             completed_at=_now_iso())
+
     except Exception as e:
-        agent_runs[run_id]["status"] = AgentStatus.FAILED
-        agent_runs[run_id]["error"] = str(e)
-        agent_runs[run_id]["completed_at"] = datetime.now().isoformat()
+        run_store.update(run_id, status="failed", error=str(e),
+                         completed_at=_now_iso())
 
 
 @router.post("/run", response_model=AgentRunResponse)
-async def run_agent(request: AgentRunRequest, background_tasks: BackgroundTasks):
+async def run_agent(request: AgentRunRequest):
     """Start an agent run."""
+    if not _PENDING_RUNS.acquire(blocking=False):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many agent runs in flight; retry later"
+        )
+
     run_id = str(uuid.uuid4())
-    
+
     issue_data = {
-        "instance_id": request.instance_id,
-        "problem_statement": request.problem_statement,
-        "repo_url": request.repo_url
+        "instance_id": getattr(request, "instance_id", None),
+        "problem_statement": getattr(request, "problem_statement", None)
+            or getattr(request, "issue_description", None),
+        "repo_url": getattr(request, "github_url", None)
     }
-    
-    agent_runs[run_id] = {
+
+    run_store.set(run_id, {
         "run_id": run_id,
-        "status": AgentStatus.PENDING,
+        "status": "pending",
         "issue_data": issue_data,
-        "created_at": datetime.now().isoformat()
-    }
-    
-    background_tasks.add_task(run_agent_task, run_id, issue_data)
-    
+        "created_at": _now_iso()
+    })
+
+    future = _EXECUTOR.submit(run_agent_task, run_id, issue_data)
+    future.add_done_callback(lambda f: _PENDING_RUNS.release())
+
     return AgentRunResponse(
         run_id=run_id,
-        status=AgentStatus.PENDING,
+        status="pending",
         message="Agent run started"
     )
 
@@ -72,16 +156,14 @@ async def run_agent(request: AgentRunRequest, background_tasks: BackgroundTasks)
 @router.get("/status/{run_id}", response_model=AgentStatusResponse)
 async def get_status(run_id: str):
     """Get agent run status."""
-    if run_id not in agent_runs:
+    run = run_store.get(run_id)
+    if run is None:
         raise HTTPException(status_code=404, detail="Run not found")
-    
-    run = agent_runs[run_id]
+
     return AgentStatusResponse(
         run_id=run_id,
         status=run["status"],
-        progress=run.get("progress"),
-        output=run.get("output"),
-        error=run.get("error")
+        message=run.get("error")
     )
 
 
@@ -91,11 +173,11 @@ async def list_runs():
     return {
         "runs": [
             {
-                "run_id": run_id,
+                "run_id": run["run_id"],
                 "status": run["status"],
                 "instance_id": run["issue_data"]["instance_id"],
                 "created_at": run["created_at"]
             }
-            for run_id, run in agent_runs.items()
+            for run in run_store.iter_runs()
         ]
     }
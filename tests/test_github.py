@@ -3,9 +3,28 @@
 Simple test script to analyze any GitHub repository
 Checks if the agent can successfully analyze the repo and identify issues
 """
+import functools
+import json
 import requests
 import time
 import sys
+from requests.adapters import HTTPAdapter
+
+# one pooled session for the whole script: every call to localhost (and
+# any GitHub fetch) reuses a keep-alive connection instead of opening a
+# fresh TCP/TLS handshake per request
+session = requests.Session()
+session.headers.update({
+    'Accept': 'application/vnd.github.v3+json',
+    'User-Agent': 'SudoDev-Test'
+})
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+session.mount('http://', _adapter)
+session.mount('https://', _adapter)
+# default (connect, read) timeout on every call so a dead socket fails
+# in seconds instead of hanging the script; explicit timeouts (the SSE
+# stream's long read) still override this
+session.request = functools.partial(session.request, timeout=(1.0, 5.0))
 
 def test_repo(github_url, issue_description, branch="main"):
     """
@@ -31,7 +50,7 @@ def test_repo(github_url, issue_description, branch="main"):
     
     # Check server
     try:
-        response = requests.get(f"{api_url}/")
+        response = session.get(f"{api_url}/")
         server_info = response.json()
         print(f"✓ Server running (v{server_info.get('version', 'unknown')})")
     except requests.exceptions.ConnectionError:
@@ -52,7 +71,7 @@ def test_repo(github_url, issue_description, branch="main"):
     
     print(f"\nSubmitting analysis request...")
     try:
-        response = requests.post(f"{api_url}/api/run", json=payload)
+        response = session.post(f"{api_url}/api/run", json=payload)
         
         if response.status_code != 200:
             print(f"✗ Request failed: {response.status_code}")
@@ -67,19 +86,54 @@ def test_repo(github_url, issue_description, branch="main"):
         print(f"✗ Error submitting request: {e}")
         return False
     
-    # Poll for results
+    # Follow progress over SSE; fall back to polling below
     print("\n" + "="*70)
     print("Monitoring Progress")
     print("="*70)
-    
+
     max_polls = 120  # 10 minutes max (5 sec intervals)
     start_time = time.time()
-    
+
+    def stream_progress():
+        """Consume the SSE stream; returns the final status, or None if
+        streaming is unavailable (older server) and polling should run"""
+        try:
+            with session.get(f"{api_url}/api/status/{run_id}/stream",
+                              stream=True, timeout=(5, 660)) as stream:
+                if stream.status_code != 200:
+                    return None
+
+                current_event = None
+                for raw in stream.iter_lines(decode_unicode=True):
+                    if not raw:
+                        current_event = None
+                        continue
+                    if raw.startswith(":"):
+                        continue  # keepalive comment
+                    if raw.startswith("event:"):
+                        current_event = raw.split(":", 1)[1].strip()
+                    elif raw.startswith("data:"):
+                        payload = json.loads(raw.split(":", 1)[1].strip())
+                        if current_event == "status":
+                            return payload["status"]
+                        elapsed = int(time.time() - start_time)
+                        print(f"[{elapsed}s] {payload}")
+        except Exception as e:
+            print(f"(stream unavailable, falling back to polling: {e})")
+        return None
+
+    streamed_status = stream_progress()
+    if streamed_status:
+        print(f"\n✓ Stream finished with status: {streamed_status.upper()}")
+
     for i in range(max_polls):
-        time.sleep(5)
-        
+        # the stream already waited for completion; fetch the final
+        # state immediately instead of sleeping
+        if not (streamed_status and i == 0):
+            time.sleep(5)
+
         try:
-            status_response = requests.get(f"{api_url}/api/status/{run_id}")
+            status_response = session.get(f"{api_url}/api/status/{run_id}")
             status_data = status_response.json()
             
             status = status_data["status"]
@@ -113,7 +167,9 @@ def test_repo(github_url, issue_description, branch="main"):
                 print("✓ ANALYSIS COMPLETED SUCCESSFULLY")
                 print("="*70)
                 
-                patch = status_data.get("patch", "")
+                # patch is served from its own endpoint, not the status poll
+                patch_response = session.get(f"{api_url}/api/runs/{run_id}/patch")
+                patch = patch_response.text if patch_response.status_code == 200 else ""
                 
                 if patch:
                     print(f"\n✓ Fix Generated ({len(patch)} characters)")
@@ -1,245 +1,453 @@
 #!/usr/bin/env python3
 """
 Test GitHub Issues Integration
+
+All four tests are I/O-bound (HTTP calls and waits), so they run
+concurrently on one httpx.AsyncClient: total wall time is the slowest
+test, not the sum of all four.
 """
-import requests
-import time
+import asyncio
+import builtins
+import contextlib
+import contextvars
+import functools
+import httpx
+import io
+import json
+import os
+import pathlib
+import re
 import sys
+import tempfile
+import threading
+import time
+import types
+from typing import NamedTuple
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
-def test_issue_url():
-    """Test with full GitHub issue URL"""
-    
-    api_url = "http://localhost:8000"
-    
-    print("="*70)
-    print("Test 1: GitHub Issue URL")
-    print("="*70)
-    
-    # Check server
+try:
+    import vcr
+except ImportError:
+    vcr = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _parse_json(response):
+    """orjson decode when available: 2-4x faster than stdlib json, which
+    adds up over the poll loop's many small status payloads"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+# only advertise br when a decoder is importable, else httpx can't
+# decompress what GitHub sends back
+_ACCEPT_ENCODING = 'gzip, deflate, br' if brotli is not None else 'gzip, deflate'
+
+# recorded on the first live run, replayed offline afterwards (with
+# vcrpy installed); tokens are scrubbed before anything hits disk
+_CASSETTE = pathlib.Path(__file__).parent / "cassettes" / "flask_issue_5063.yaml"
+
+
+def _issue_cassette():
+    """Cassette context for the direct GitHub fetch, or a no-op without
+    vcrpy; record_mode='once' records when the file is missing and
+    replays deterministically (sub-ms, offline) when it exists."""
+    if vcr is None:
+        return contextlib.nullcontext()
+    _CASSETTE.parent.mkdir(exist_ok=True)
+    return vcr.use_cassette(
+        str(_CASSETTE),
+        record_mode='once',
+        filter_headers=['authorization'],
+    )
+
+# the suite only ever reads these issue fields; with ijson installed the
+# rest of the payload is never materialized as Python objects
+_WANTED_FIELDS = {'title', 'state', 'comments', 'labels', 'body'}
+
+BANNER = "="*70
+
+# compiled once: a single scan per log line instead of two substring passes
+_ISSUE_LOG_RE = re.compile(r"ISSUE|GitHub")
+_NUM_LOG_RE = re.compile(r"ISSUE|#")
+
+# Each test's output is buffered and flushed as one block when the test
+# finishes, so the four concurrent tests don't interleave their prints.
+_OUT = contextvars.ContextVar("out", default=None)
+_PRINT_LOCK = threading.Lock()
+
+
+def print(*args, **kwargs):  # shadows builtins.print inside this module
+    buf = _OUT.get()
+    if buf is not None and 'file' not in kwargs:
+        kwargs['file'] = buf
+    builtins.print(*args, **kwargs)
+
+
+async def run_buffered(test, client):
+    """Run one test with its print output captured, then flush it whole."""
+    buf = io.StringIO()
+    token = _OUT.set(buf)
     try:
-        response = requests.get(f"{api_url}/")
-        print(f"✓ Server running: {response.json()}")
-    except:
-        print("✗ Server not running! Start with: make run")
-        return False
-    
-    # Test payload with issue URL
-    payload = {
-        "mode": "github",
-        "github_url": "https://github.com/pallets/flask",
-        "branch": "main",
-        "issue_url": "https://github.com/pallets/flask/issues/5063"
+        result = await test(client)
+    finally:
+        _OUT.reset(token)
+        with _PRINT_LOCK:
+            sys.stdout.write(buf.getvalue())
+            sys.stdout.flush()
+    return result
+
+_CACHE_DIR = pathlib.Path(tempfile.gettempdir()) / "sudodev_issue_cache"
+
+_GRAPHQL_URL = "https://api.github.com/graphql"
+
+
+async def fetch_issues_graphql(client, owner, repo, numbers, token):
+    """Fetch several issues in one GraphQL POST using aliased fields.
+
+    One round-trip regardless of how many issues the suite covers,
+    instead of one REST GET each. Returns {number: issue_dict} with the
+    same keys the REST path produces, or None if the request fails (the
+    caller then falls back to REST).
+    """
+    fields = " ".join(
+        f"i{n}: issue(number: {n}) {{ title state body "
+        f"comments {{ totalCount }} labels(first: 20) {{ nodes {{ name }} }} }}"
+        for n in numbers
+    )
+    query = (
+        "query($owner: String!, $repo: String!) { "
+        "r: repository(owner: $owner, name: $repo) { " + fields + " } }"
+    )
+
+    response = await client.post(
+        _GRAPHQL_URL,
+        json={"query": query, "variables": {"owner": owner, "repo": repo}},
+        headers={
+            'Authorization': f'bearer {token}',
+            'User-Agent': 'SudoDev-Test'
+        }
+    )
+    if response.status_code != 200:
+        return None
+
+    repo_data = (response.json().get("data") or {}).get("r") or {}
+    issues = {}
+    for n in numbers:
+        node = repo_data.get(f"i{n}")
+        if node:
+            issues[n] = {
+                'title': node.get('title'),
+                'state': (node.get('state') or '').lower(),
+                'body': node.get('body') or '',
+                'comments': (node.get('comments') or {}).get('totalCount', 0),
+                'labels': (node.get('labels') or {}).get('nodes', []),
+            }
+    return issues or None
+
+
+async def post_with_retry(client, url, payload, attempts=3):
+    """POST with bounded retries on connect/timeout errors.
+
+    Transient failures (server mid-restart, dropped socket) get two
+    retries with doubling backoff instead of failing the test outright;
+    anything else propagates immediately.
+    """
+    backoff = 0.25
+    for attempt in range(attempts):
+        try:
+            return await client.post(url, json=payload)
+        except (httpx.ConnectError, httpx.TimeoutException):
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(backoff)
+            backoff *= 2
+
+
+async def fetch_issue_cached(client, owner, repo, num, ttl=300):
+    """Fetch a GitHub issue through a small on-disk TTL cache.
+
+    Within `ttl` seconds the cached body is returned with no network
+    round-trip at all; after that an If-None-Match revalidation is sent,
+    and a 304 reuses the cached body without costing rate-limit budget.
+    This keeps repeated test runs from burning GitHub's 60 req/hour
+    unauthenticated quota.
+    """
+    _CACHE_DIR.mkdir(exist_ok=True)
+    body_path = _CACHE_DIR / f"{owner}_{repo}_{num}.json"
+    etag_path = _CACHE_DIR / f"{owner}_{repo}_{num}.etag"
+
+    if body_path.exists() and time.time() - body_path.stat().st_mtime < ttl:
+        return json.loads(body_path.read_text())
+
+    headers = {
+        'Accept': 'application/vnd.github.v3+json',
+        'Accept-Encoding': _ACCEPT_ENCODING,
+        'User-Agent': 'SudoDev-Test'
     }
-    
-    print(f"\nSubmitting request with issue URL...")
-    print(f"  Repository: {payload['github_url']}")
-    print(f"  Issue URL: {payload['issue_url']}")
-    
-    try:
-        response = requests.post(f"{api_url}/api/run", json=payload)
-        
-        if response.status_code != 200:
-            print(f"\n✗ Request failed: {response.status_code}")
-            print(f"Response: {response.text}")
-            return False
-        
-        data = response.json()
-        run_id = data["run_id"]
-        
-        print(f"\n✓ Request accepted!")
-        print(f"  Run ID: {run_id}")
-        
-        # Check if issue was fetched
-        time.sleep(2)
-        status_response = requests.get(f"{api_url}/api/status/{run_id}")
-        status_data = status_response.json()
-        
-        logs = status_data.get("logs", [])
-        issue_log = [log for log in logs if "ISSUE" in log or "GitHub" in log]
-        
-        if issue_log:
-            print(f"\n✓ Issue fetched successfully!")
-            for log in issue_log[:3]:
-                print(f"  {log}")
-            return True
-        else:
-            print(f"\n⚠ Issue fetch unclear, but request accepted")
-            return True
-    
-    except Exception as e:
-        print(f"\n✗ Error: {e}")
-        return False
+    token = os.environ.get('GITHUB_TOKEN')
+    if token:
+        # authenticated requests get 5000 req/hr instead of 60
+        headers['Authorization'] = f'Bearer {token}'
+    if body_path.exists() and etag_path.exists():
+        headers['If-None-Match'] = etag_path.read_text().strip()
+
+    response = await client.get(
+        f"https://api.github.com/repos/{owner}/{repo}/issues/{num}",
+        headers=headers
+    )
+
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    if remaining is not None:
+        encoding = response.headers.get('Content-Encoding', 'identity')
+        print(f"  (GitHub rate limit remaining: {remaining}, "
+              f"content-encoding: {encoding})")
+
+    if response.status_code == 304:
+        # unchanged upstream: refresh the TTL window and reuse the body
+        os.utime(body_path)
+        return json.loads(body_path.read_text())
+
+    response.raise_for_status()
+    if ijson is not None:
+        # stream-parse top-level pairs and keep only the wanted fields:
+        # a large issue body's comment/reaction sub-trees never become
+        # Python objects
+        issue_data = {
+            key: value
+            for key, value in ijson.kvitems(io.BytesIO(response.content), '')
+            if key in _WANTED_FIELDS
+        }
+    else:
+        issue_data = response.json()
+
+    # write atomically so an interrupted run never leaves a truncated file
+    tmp_path = _CACHE_DIR / f"{owner}_{repo}_{num}.json.tmp"
+    tmp_path.write_text(json.dumps(issue_data))
+    os.replace(tmp_path, body_path)
+    etag = response.headers.get('ETag')
+    if etag:
+        etag_path.write_text(etag)
+
+    return issue_data
+
 
+async def wait_for_log(client, api_url, run_id, marker, timeout=5.0):
+    """Poll run status until `marker` shows up in the logs.
+
+    Starts at a 50 ms interval and backs off exponentially (capped at
+    0.5 s), so a fast backend is caught in milliseconds instead of the
+    old fixed 2 s sleep, while a slow one still gets `timeout` seconds.
+    Returns the last logs seen (empty if the run never produced any).
+    """
+    interval = 0.05
+    deadline = time.monotonic() + timeout
+    logs = []
+    while True:
+        response = await client.get(f"{api_url}/api/status/{run_id}")
+        content_type = response.headers.get('content-type', '')
+        if content_type.startswith('application/json'):
+            logs = _parse_json(response).get("logs", [])
+            if any(marker in log for log in logs):
+                break
+        if time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(interval)
+        interval = min(interval * 1.5, 0.5)
+    return logs
+
+
+class Case(NamedTuple):
+    """One table-driven submission case: payload in, optional log marker
+    to wait for."""
+    name: str
+    title: str
+    payload: dict
+    marker: "re.Pattern | None"
+
+
+_FLASK_REPO = "https://github.com/pallets/flask"
+
+# read-only skeleton shared by every submission case; MappingProxyType
+# keeps a stray case from mutating the baseline under the others
+BASE_PAYLOAD = types.MappingProxyType({
+    "mode": "github",
+    "github_url": _FLASK_REPO,
+    "branch": "main",
+})
+
+CASES = [
+    Case("issue_url", "GitHub Issue URL",
+         {**BASE_PAYLOAD, "issue_url": f"{_FLASK_REPO}/issues/5063"},
+         _ISSUE_LOG_RE),
+    Case("issue_number", "GitHub Issue Number",
+         {**BASE_PAYLOAD, "issue_number": 5063},
+         _NUM_LOG_RE),
+    Case("manual", "Manual Description (Existing Method)",
+         {**BASE_PAYLOAD,
+          "issue_description": "Test issue: verify manual description still works"},
+         None),
+]
+
+
+async def run_case(client, case):
+    """Submit one case's payload and, if it has a marker, wait for the
+    matching log line. The three submission tests shared ~80% of their
+    code; this is that code, once."""
 
-def test_issue_number():
-    """Test with just issue number"""
-    
     api_url = "http://localhost:8000"
-    
-    print("\n" + "="*70)
-    print("Test 2: GitHub Issue Number")
-    print("="*70)
-    
-    # Test payload with issue number
-    payload = {
-        "mode": "github",
-        "github_url": "https://github.com/pallets/flask",
-        "branch": "main",
-        "issue_number": 5063
-    }
-    
-    print(f"\nSubmitting request with issue number...")
-    print(f"  Repository: {payload['github_url']}")
-    print(f"  Issue #: {payload['issue_number']}")
-    
+
+    print(BANNER)
+    print(f"Test: {case.title}")
+    print(BANNER)
+
+    print(f"\nSubmitting {case.name} request...")
+    for key, value in case.payload.items():
+        if key not in ("mode", "branch"):
+            print(f"  {key}: {value}")
+
     try:
-        response = requests.post(f"{api_url}/api/run", json=payload)
-        
+        response = await post_with_retry(client, f"{api_url}/api/run", case.payload)
+
         if response.status_code != 200:
             print(f"\n✗ Request failed: {response.status_code}")
             print(f"Response: {response.text}")
             return False
-        
-        data = response.json()
-        run_id = data["run_id"]
-        
+
+        run_id = response.json()["run_id"]
         print(f"\n✓ Request accepted!")
         print(f"  Run ID: {run_id}")
-        
-        # Check logs
-        time.sleep(2)
-        status_response = requests.get(f"{api_url}/api/status/{run_id}")
-        status_data = status_response.json()
-        
-        logs = status_data.get("logs", [])
-        issue_log = [log for log in logs if "ISSUE" in log or "#" in log]
-        
+
+        if case.marker is None:
+            return True
+
+        # poll until the issue shows up in the logs
+        logs = await wait_for_log(client, api_url, run_id, "ISSUE")
+        issue_log = list(filter(case.marker.search, logs))[:3]
+
         if issue_log:
-            print(f"\n✓ Issue number processed!")
-            for log in issue_log[:3]:
+            print(f"\n✓ Issue processed!")
+            for log in issue_log:
                 print(f"  {log}")
-            return True
         else:
             print(f"\n⚠ Issue processing unclear, but request accepted")
-            return True
-    
+        return True
+
     except Exception as e:
         print(f"\n✗ Error: {e}")
         return False
 
 
-def test_manual_description():
-    """Test with manual description (existing way)"""
-    
-    api_url = "http://localhost:8000"
-    
-    print("\n" + "="*70)
-    print("Test 3: Manual Description (Existing Method)")
-    print("="*70)
-    
-    payload = {
-        "mode": "github",
-        "github_url": "https://github.com/pallets/flask",
-        "branch": "main",
-        "issue_description": "Test issue: verify manual description still works"
-    }
-    
-    print(f"\nSubmitting request with manual description...")
-    
+async def test_fetch_issue_directly(client):
+    """Test the GitHub API fetch directly"""
+
+    print("\n" + BANNER)
+    print("Test 4: Direct GitHub API Fetch")
+    print(BANNER)
+
+    print(f"\nFetching issue from GitHub API...")
+    print(f"  Issue: pallets/flask#5063")
+
     try:
-        response = requests.post(f"{api_url}/api/run", json=payload)
-        
-        if response.status_code != 200:
-            print(f"\n✗ Request failed: {response.status_code}")
-            return False
-        
-        print(f"\n✓ Manual description still works!")
+        with _issue_cassette():
+            issue_data = None
+            token = os.getenv('GITHUB_TOKEN')
+            if token:
+                # one batched GraphQL POST covers every issue under test
+                batch = await fetch_issues_graphql(
+                    client, "pallets", "flask", [5063], token
+                )
+                if batch:
+                    issue_data = batch.get(5063)
+            if issue_data is None:
+                # no token (GraphQL requires auth): REST with the on-disk cache
+                issue_data = await fetch_issue_cached(client, "pallets", "flask", 5063)
+
+        print(f"\n✓ Issue fetched successfully!")
+        print(f"  Title: {issue_data.get('title', 'N/A')}")
+        print(f"  State: {issue_data.get('state', 'N/A')}")
+        print(f"  Comments: {issue_data.get('comments', 0)}")
+        print(f"  Labels: {[l['name'] for l in issue_data.get('labels', [])]}")
+
+        body = issue_data.get('body', '')
+        print(f"\n  Description preview:")
+        print(f"  {body[:200]}...")
+
         return True
-    
+
     except Exception as e:
         print(f"\n✗ Error: {e}")
         return False
 
 
-def test_fetch_issue_directly():
-    """Test the GitHub API fetch directly"""
-    
-    print("\n" + "="*70)
-    print("Test 4: Direct GitHub API Fetch")
-    print("="*70)
-    
-    issue_url = "https://api.github.com/repos/pallets/flask/issues/5063"
-    
-    print(f"\nFetching issue from GitHub API...")
-    print(f"  URL: {issue_url}")
-    
+async def ensure_server(client, api_url, timeout=1.0):
+    """One liveness probe for the whole suite; fails in one short
+    connection timeout instead of once per server-dependent test."""
     try:
-        response = requests.get(
-            issue_url,
-            headers={
-                'Accept': 'application/vnd.github.v3+json',
-                'User-Agent': 'SudoDev-Test'
-            },
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            issue_data = response.json()
-            
-            print(f"\n✓ Issue fetched successfully!")
-            print(f"  Title: {issue_data.get('title', 'N/A')}")
-            print(f"  State: {issue_data.get('state', 'N/A')}")
-            print(f"  Comments: {issue_data.get('comments', 0)}")
-            print(f"  Labels: {[l['name'] for l in issue_data.get('labels', [])]}")
-            
-            body = issue_data.get('body', '')
-            print(f"\n  Description preview:")
-            print(f"  {body[:200]}...")
-            
-            return True
-        else:
-            print(f"\n✗ Failed to fetch: {response.status_code}")
-            return False
-    
-    except Exception as e:
-        print(f"\n✗ Error: {e}")
+        response = await client.get(f"{api_url}/", timeout=timeout)
+        print(f"✓ Server running: {response.json()}")
+        return True
+    except Exception:
+        print("✗ Server not running! Start with: make run")
         return False
 
 
-def main():
-    print("="*70)
+async def main():
+    print(BANNER)
     print("GitHub Issues Integration Test Suite")
-    print("="*70)
-    
-    results = {}
-    
-    # Test 1: Direct API fetch (fastest)
-    results['direct_api'] = test_fetch_issue_directly()
-    
-    # Test 2: Issue URL
-    results['issue_url'] = test_issue_url()
-    
-    # Test 3: Issue number
-    results['issue_number'] = test_issue_number()
-    
-    # Test 4: Manual description
-    results['manual'] = test_manual_description()
-    
+    print(BANNER)
+
+    api_url = "http://localhost:8000"
+
+    # one client for the whole suite; all tests run concurrently, each
+    # with its output buffered so the blocks print whole
+    # 1 s connect / 5 s read: a stalled server fails fast instead of
+    # hanging the suite on the library default
+    timeout = httpx.Timeout(5.0, connect=1.0)
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        server_available = await ensure_server(client, api_url)
+
+        tasks = [run_buffered(test_fetch_issue_directly, client)]
+        if server_available:
+            tasks += [
+                run_buffered(functools.partial(run_case, case=case), client)
+                for case in CASES
+            ]
+        outcomes = list(await asyncio.gather(*tasks))
+
+    if not server_available:
+        print("\n⚠ Skipping server-dependent tests (server is down)")
+        outcomes += [False] * len(CASES)
+
+    results = dict(zip(['direct_api'] + [case.name for case in CASES], outcomes))
+
     # Summary
-    print("\n" + "="*70)
+    print("\n" + BANNER)
     print("TEST SUMMARY")
-    print("="*70)
-    
+    print(BANNER)
+
     for test_name, result in results.items():
         status = "✓ PASS" if result else "✗ FAIL"
         print(f"{status:10} {test_name}")
-    
+
     passed = sum(1 for r in results.values() if r)
     total = len(results)
-    
+
     print(f"\nResults: {passed}/{total} tests passed")
-    
+
     if passed == total:
         print("\n🎉 All tests passed! GitHub Issues integration is working!")
         return 0
@@ -249,4 +457,4 @@ def main():
 
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(asyncio.run(main()))